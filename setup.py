@@ -1,7 +1,7 @@
 from setuptools import setup
 
 setup(
-    python_requires='>=3.6',
+    python_requires='>=3.8',
     name='wikidump-reader',
     version='1.0',
     packages=['wikidump_reader'],
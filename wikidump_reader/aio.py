@@ -0,0 +1,148 @@
+import asyncio
+import functools
+import multiprocessing
+import queue
+import threading
+from collections import deque
+
+from wikidump_reader.wikidump_reader import WikiDumpReader, _batches, _clean_batch
+
+
+def _produce_batches(reader, file, batch_size, kwargs, out_queue, stop_event):
+    """
+    Read pages and put them, per batch, in out_queue; runs in a separate thread or process. The end of the stream is
+    marked with None, an error with the exception object.
+    """
+    try:
+        for batch in _batches(reader.read_page(file, **kwargs), batch_size):
+            if stop_event.is_set():
+                return
+            out_queue.put(batch)
+        out_queue.put(None)
+    except Exception as e:
+        out_queue.put(e)
+
+
+def _get_batch(out_queue, stop_event, timeout=0.1):
+    """
+    Get the next batch from out_queue; runs in an executor thread. Returns None once stop_event is set, so the thread
+    is released when the reader is closed, even if the producer is gone.
+    """
+    while True:
+        try:
+            return out_queue.get(timeout=timeout)
+        except queue.Empty:
+            if stop_event.is_set():
+                return None
+
+
+class AsyncWikiDumpReader:
+    """
+    asyncio counterparts of 'WikiDumpReader.read_page' and 'WikiDumpReader.clean'.
+
+    Decompression and parsing run in a separate thread, or in a separate process if b_parse_in_process is True,
+    which keeps them from competing with the event loop for the GIL. At most 'prefetch' batches of pages are read
+    ahead. Cleaning runs in clean_executor, e.g., a concurrent.futures.ProcessPoolExecutor; if None, asyncio's
+    default (thread pool) executor is used.
+    """
+    def __init__(self, reader=None, clean_executor=None, b_parse_in_process=False, prefetch=4, batch_size=100):
+        """
+
+        :param reader: WikiDumpReader to use; defaults to WikiDumpReader()
+        :param clean_executor: concurrent.futures executor used for cleaning
+        :param b_parse_in_process: parse the dump in a separate process instead of a thread
+        :param prefetch: max number of batches read or cleaned ahead of the consumer
+        :param batch_size: number of pages per batch
+        """
+        self.reader = WikiDumpReader() if reader is None else reader
+        self.clean_executor = clean_executor
+        self.b_parse_in_process = b_parse_in_process
+        self.prefetch = prefetch
+        self.batch_size = batch_size
+
+    async def read_page(self, file, **kwargs):
+        """
+        Asynchronous version of 'WikiDumpReader.read_page'.
+
+        :param file:
+        :param kwargs: filters, see 'WikiDumpReader.read_page'
+        :return: async generator of (title, text) tuples
+        """
+        async for batch in self._read_batches(file, **kwargs):
+            for page in batch:
+                yield page
+
+    async def _read_batches(self, file, **kwargs):
+        loop = asyncio.get_running_loop()
+        if self.b_parse_in_process:
+            out_queue = multiprocessing.Queue(maxsize=self.prefetch)
+            stop_event = multiprocessing.Event()
+            worker = multiprocessing.Process(target=_produce_batches, daemon=True,
+                                             args=(self.reader, file, self.batch_size, kwargs, out_queue, stop_event))
+        else:
+            out_queue = queue.Queue(maxsize=self.prefetch)
+            stop_event = threading.Event()
+            worker = threading.Thread(target=_produce_batches, daemon=True,
+                                      args=(self.reader, file, self.batch_size, kwargs, out_queue, stop_event))
+        worker.start()
+
+        try:
+            while True:
+                batch = await loop.run_in_executor(None, _get_batch, out_queue, stop_event)
+                if batch is None:
+                    break
+                if isinstance(batch, Exception):
+                    raise batch
+                yield batch
+        finally:
+            stop_event.set()
+            if self.b_parse_in_process:
+                worker.terminate()
+                worker.join()
+            else:
+                # Unblock the producer if it is waiting for room in the queue
+                try:
+                    while True:
+                        out_queue.get_nowait()
+                except queue.Empty:
+                    pass
+
+    async def clean(self, text, title='N/A'):
+        """
+        Asynchronous version of 'WikiDumpReader.clean'.
+
+        :param text:
+        :param title:
+        :return: cleaned text
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.clean_executor,
+                                          functools.partial(self.reader.clean, text, title=title))
+
+    async def clean_pages(self, file, **kwargs):
+        """
+        Read and clean the pages of a dump; the asynchronous version of
+        'WikiDumpReader.clean_pages(WikiDumpReader.read_page(file))'. Pages that can't be cleaned are skipped.
+
+        :param file:
+        :param kwargs: filters, see 'WikiDumpReader.read_page'
+        :return: async generator of (title, cleaned text) tuples, in dump order
+        """
+        loop = asyncio.get_running_loop()
+        cls = type(self.reader)
+        pending = deque()
+        try:
+            async for batch in self._read_batches(file, **kwargs):
+                pending.append(loop.run_in_executor(self.clean_executor, _clean_batch,
+                                                    (cls, batch, None, None, None, False)))
+                while len(pending) > self.prefetch or (pending and pending[0].done()):
+                    res, _, _ = await pending.popleft()
+                    for page in res:
+                        yield page
+            while pending:
+                res, _, _ = await pending.popleft()
+                for page in res:
+                    yield page
+        finally:
+            for future in pending:
+                future.cancel()
@@ -0,0 +1,140 @@
+import struct
+from array import array
+
+
+class PageBatch:
+    """
+    Columnar batch of pages, as returned by 'WikiDumpReader.read_page_batches'.
+
+    The texts of all pages are utf-8 encoded and concatenated in a single buffer; the text of page i is
+    buffer[offsets[i]:offsets[i+1]]. Page ids and offsets are int64 arrays, titles a list of strings.
+
+    A batch can be serialized to a single flat buffer with 'to_bytes'/'to_shared_memory', and reopened without
+    copying the texts with 'from_buffer', which makes it cheap to pass batches between processes.
+    """
+    HEADER = struct.Struct('=qqq')
+
+    def __init__(self, ids, titles, offsets, buffer):
+        """
+
+        :param ids: int64 array (or memoryview) of page ids
+        :param titles: list of titles
+        :param offsets: int64 array (or memoryview) of len(ids) + 1 text offsets in buffer
+        :param buffer: bytes-like object holding the concatenated utf-8 encoded texts
+        """
+        self.ids = ids
+        self.titles = titles
+        self.offsets = offsets
+        self.buffer = buffer
+
+    @classmethod
+    def from_pages(cls, pages):
+        """
+        Build a batch from (page_id, title, text) tuples.
+
+        :param pages:
+        :return:
+        """
+        ids, titles, offsets = array('q'), [], array('q', [0])
+        buffer = bytearray()
+        for page_id, title, text in pages:
+            ids.append(page_id)
+            titles.append(title)
+            buffer += text.encode('utf-8')
+            offsets.append(len(buffer))
+        return cls(ids, titles, offsets, bytes(buffer))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, i):
+        """
+        :return: (page_id, title, text) tuple of page i
+        """
+        return self.ids[i], self.titles[i], self.text(i)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def text_view(self, i):
+        """
+        Get the utf-8 encoded text of page i, without copying it.
+
+        :param i:
+        :return: memoryview
+        """
+        return memoryview(self.buffer)[self.offsets[i]:self.offsets[i + 1]]
+
+    def text(self, i):
+        """
+        Get the text of page i.
+
+        :param i:
+        :return: str
+        """
+        return str(self.text_view(i), 'utf-8')
+
+    def offsets_numpy(self):
+        """
+        Get the text offsets as a NumPy array, without copying them. Requires NumPy.
+
+        :return:
+        """
+        import numpy as np
+        return np.frombuffer(self.offsets, dtype=np.int64)
+
+    def to_bytes(self):
+        """
+        Serialize the batch to a single flat buffer. Layout (native byte order):
+            header: nb_pages, text buffer size, titles buffer size
+            ids: nb_pages * int64
+            text offsets: (nb_pages + 1) * int64
+            title offsets: (nb_pages + 1) * int64
+            text buffer
+            titles buffer
+
+        :return: bytes
+        """
+        titles, title_offsets = bytearray(), array('q', [0])
+        for title in self.titles:
+            titles += title.encode('utf-8')
+            title_offsets.append(len(titles))
+        return b''.join((self.HEADER.pack(len(self), len(self.buffer), len(titles)),
+                         bytes(self.ids), bytes(self.offsets), title_offsets.tobytes(),
+                         bytes(self.buffer), bytes(titles)))
+
+    def to_shared_memory(self):
+        """
+        Copy the serialized batch into a new shared memory block. The receiving process can open it with
+        'PageBatch.from_buffer(SharedMemory(name).buf)'. The caller is responsible for unlinking the block.
+
+        :return: multiprocessing.shared_memory.SharedMemory object
+        """
+        from multiprocessing.shared_memory import SharedMemory
+        data = self.to_bytes()
+        shm = SharedMemory(create=True, size=max(len(data), 1))
+        shm.buf[:len(data)] = data
+        return shm
+
+    @classmethod
+    def from_buffer(cls, buffer):
+        """
+        Open a batch serialized by 'to_bytes'. Ids, offsets and texts are views on buffer, not copies.
+
+        :param buffer: bytes-like object
+        :return:
+        """
+        view = memoryview(buffer)
+        nb_pages, text_size, titles_size = cls.HEADER.unpack_from(view, 0)
+        pos = cls.HEADER.size
+        ids = view[pos:pos + 8 * nb_pages].cast('q')
+        pos += 8 * nb_pages
+        offsets = view[pos:pos + 8 * (nb_pages + 1)].cast('q')
+        pos += 8 * (nb_pages + 1)
+        title_offsets = view[pos:pos + 8 * (nb_pages + 1)].cast('q')
+        pos += 8 * (nb_pages + 1)
+        text_buffer = view[pos:pos + text_size]
+        pos += text_size
+        titles = [str(view[pos + title_offsets[i]:pos + title_offsets[i + 1]], 'utf-8') for i in range(nb_pages)]
+        return cls(ids, titles, offsets, text_buffer)
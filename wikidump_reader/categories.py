@@ -0,0 +1,211 @@
+import mmap
+import struct
+from array import array
+
+from wikidump_reader.redirects import RedirectTable
+
+
+class CategoryIndexWriter:
+    """
+    Collect category memberships during a read/clean run, and write them as an on-disk category -> page id inverted
+    index that can be opened with 'CategoryIndex'.
+
+    Usage:
+        writer = CategoryIndexWriter()
+        for page in reader.read_page_records(dump):
+            text = page.cleaned
+            writer.add(page.id, page.categories)
+        writer.write(file)
+
+    File layout (native byte order):
+        header: magic, version, nb_categories, nb_postings
+        name offsets: (nb_categories + 1) * int64, into the names blob
+        posting offsets: (nb_categories + 1) * int64, into the postings
+        postings: nb_postings * int64, page ids; sorted per category
+        names blob: utf-8 encoded category names, sorted bytewise
+    """
+    MAGIC = b'WDCI'
+    VERSION = 1
+    HEADER = struct.Struct('=4sIqq')
+
+    def __init__(self):
+        self._ids = {}
+        self._categories = array('q')
+        self._pages = array('q')
+
+    def __len__(self):
+        """
+        :return: number of memberships added so far
+        """
+        return len(self._pages)
+
+    def add(self, page_id, categories):
+        """
+        Add the categories of a page.
+
+        :param page_id:
+        :param categories: category names, with or without 'Category:' prefix
+        :return:
+        """
+        for category in categories:
+            category = CategoryIndex.normalize_category(category)
+            if not category:
+                continue
+            cat_id = self._ids.get(category)
+            if cat_id is None:
+                cat_id = self._ids[category] = len(self._ids)
+            self._categories.append(cat_id)
+            self._pages.append(page_id)
+
+    def write(self, file):
+        """
+        Write the index.
+
+        :param file:
+        :return: the opened CategoryIndex
+        """
+        names = sorted((name.encode('utf-8'), cat_id) for name, cat_id in self._ids.items())
+        rank = array('q', [0]) * len(names)
+        name_offsets = array('q', [0])
+        blob = bytearray()
+        for i, (name, cat_id) in enumerate(names):
+            rank[cat_id] = i
+            blob += name
+            name_offsets.append(len(blob))
+
+        # Counting sort of the memberships by category rank
+        counts = array('q', [0]) * (len(names) + 1)
+        for cat_id in self._categories:
+            counts[rank[cat_id] + 1] += 1
+        for i in range(len(names)):
+            counts[i + 1] += counts[i]
+        posting_offsets = array('q', counts)
+        postings = array('q', [0]) * len(self._pages)
+        for cat_id, page_id in zip(self._categories, self._pages):
+            r = rank[cat_id]
+            postings[counts[r]] = page_id
+            counts[r] += 1
+
+        # Sort and deduplicate the page ids of every category
+        dedup = array('q')
+        dedup_offsets = array('q', [0])
+        for i in range(len(names)):
+            prev = None
+            for page_id in sorted(postings[posting_offsets[i]:posting_offsets[i + 1]]):
+                if page_id != prev:
+                    dedup.append(page_id)
+                    prev = page_id
+            dedup_offsets.append(len(dedup))
+
+        with open(file, 'wb') as fout:
+            fout.write(self.HEADER.pack(self.MAGIC, self.VERSION, len(names), len(dedup)))
+            name_offsets.tofile(fout)
+            dedup_offsets.tofile(fout)
+            dedup.tofile(fout)
+            fout.write(blob)
+
+        return CategoryIndex(file)
+
+
+class CategoryIndex:
+    """
+    Memory-mapped category -> page id inverted index, as written by 'CategoryIndexWriter'. Lookups are a binary
+    search over the sorted category names, and return the page ids without copying them.
+    """
+    def __init__(self, file):
+        self._fin = open(file, 'rb')
+        self._mm = mmap.mmap(self._fin.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.nb_categories, self.nb_postings = CategoryIndexWriter.HEADER.unpack_from(self._mm, 0)
+        if magic != CategoryIndexWriter.MAGIC or version != CategoryIndexWriter.VERSION:
+            self.close()
+            raise ValueError(f"File [{file}] is not a category index.")
+
+        view = memoryview(self._mm)
+        pos = CategoryIndexWriter.HEADER.size
+        self._name_offsets = view[pos:pos + 8 * (self.nb_categories + 1)].cast('q')
+        pos += 8 * (self.nb_categories + 1)
+        self._posting_offsets = view[pos:pos + 8 * (self.nb_categories + 1)].cast('q')
+        pos += 8 * (self.nb_categories + 1)
+        self._postings = view[pos:pos + 8 * self.nb_postings].cast('q')
+        pos += 8 * self.nb_postings
+        self._blob_start = pos
+        view.release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self):
+        return self.nb_categories
+
+    def __contains__(self, category):
+        return self._find(self.normalize_category(category)) is not None
+
+    def close(self):
+        """
+        Close the index. If page ids returned by 'get' are still in use, the mapping stays open until they are
+        released.
+        """
+        try:
+            for view in ('_name_offsets', '_posting_offsets', '_postings'):
+                if hasattr(self, view):
+                    getattr(self, view).release()
+                    delattr(self, view)
+            if self._mm is not None:
+                try:
+                    self._mm.close()
+                except BufferError:
+                    pass
+                self._mm = None
+        finally:
+            self._fin.close()
+
+    @staticmethod
+    def normalize_category(category):
+        """
+        Normalize a category name: drop the 'Category:' prefix, then normalize it like a title.
+
+        :param category:
+        :return:
+        """
+        category = category.strip()
+        if category[:9].lower() == 'category:':
+            category = category[9:]
+        return RedirectTable.normalize_title(category)
+
+    def _name(self, i):
+        return self._mm[self._blob_start + self._name_offsets[i]:self._blob_start + self._name_offsets[i + 1]]
+
+    def _find(self, category):
+        key = category.encode('utf-8')
+        lo, hi = 0, self.nb_categories
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._name(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.nb_categories and self._name(lo) == key:
+            return lo
+        return None
+
+    def get(self, category):
+        """
+        Get the ids of the pages in a category.
+
+        :param category: category name, with or without 'Category:' prefix
+        :return: sorted int64 memoryview of page ids; empty if the category is unknown
+        """
+        i = self._find(self.normalize_category(category))
+        if i is None:
+            return self._postings[0:0]
+        return self._postings[self._posting_offsets[i]:self._posting_offsets[i + 1]]
+
+    def categories(self):
+        """
+        :return: generator of all category names, in sorted order
+        """
+        for i in range(self.nb_categories):
+            yield self._name(i).decode('utf-8')
@@ -0,0 +1,189 @@
+import json
+import mmap
+import multiprocessing
+from array import array
+
+from wikidump_reader.wikidump_reader import _batches
+
+
+# Tokenizer of the current worker process, set once per worker by '_init_worker'
+_tokenizer = None
+
+
+def _init_worker(tokenizer):
+    """
+    Initializer of the 'TokenExporter.export' worker processes; tokenizers can be large, so they are only sent once.
+    """
+    global _tokenizer
+    _tokenizer = tokenizer
+
+
+def _tokenize_batch(args):
+    """
+    Worker function for 'TokenExporter.export'.
+    """
+    return _tokenize(_tokenizer, *args)
+
+
+def _tokenize(tokenizer, typecode, batch):
+    tokens, lengths = array(typecode), array('q')
+    for title, text in batch:
+        ids = tokenizer(text)
+        tokens.extend(ids)
+        lengths.append(len(ids))
+    return [title for title, text in batch], tokens.tobytes(), lengths
+
+
+class TokenExporter:
+    """
+    Export pretokenized text, e.g., the output of 'WikiDumpReader.clean_pages', to memory-mapped files.
+
+    For an output prefix 'out', five files are written:
+        out.bin: the token ids of all documents, concatenated, as a flat array of the chosen dtype
+        out.idx: (nb_docs + 1) int64 document boundary offsets in out.bin, in tokens; document i holds the tokens
+            idx[i]:idx[i+1]
+        out.titles: the utf-8 encoded titles of all documents, concatenated
+        out.titles.idx: (nb_docs + 1) int64 title boundary offsets in out.titles, in bytes
+        out.json: metadata: dtype, number of documents and tokens, and any user supplied metadata
+    All arrays are stored in native byte order. Use 'TokenDataset' to open them.
+    """
+    DTYPES = {'uint16': 'H', 'uint32': 'I', 'int32': 'i', 'int64': 'q'}
+
+    def __init__(self, tokenizer, dtype='uint32', nb_workers=1, batch_size=100):
+        """
+
+        :param tokenizer: callable mapping a text to a sequence of token ids; must be picklable if nb_workers > 1
+        :param dtype: one of 'uint16', 'uint32', 'int32', 'int64'
+        :param nb_workers: number of worker processes
+        :param batch_size: number of documents sent to a worker at once
+        """
+        if dtype not in self.DTYPES:
+            raise ValueError(f"Unsupported dtype [{dtype}], use one of {list(self.DTYPES)}.")
+        self.tokenizer = tokenizer
+        self.dtype = dtype
+        self.nb_workers = nb_workers
+        self.batch_size = batch_size
+
+    def export(self, pages, prefix, metadata=None):
+        """
+        Tokenize pages and write them to prefix.bin/.idx/.titles/.titles.idx/.json.
+
+        :param pages: iterable of (title, text) tuples
+        :param prefix: output path prefix
+        :param metadata: dictionary with extra metadata to store in the header
+        :return: number of documents written
+        """
+        typecode = self.DTYPES[self.dtype]
+        jobs = ((typecode, batch) for batch in _batches(pages, self.batch_size))
+        offsets = array('q', [0])
+        title_offsets = array('q', [0])
+
+        with open(prefix + '.bin', 'wb') as fout, open(prefix + '.titles', 'wb') as fout_titles:
+            if self.nb_workers > 1:
+                with multiprocessing.Pool(self.nb_workers, initializer=_init_worker,
+                                          initargs=(self.tokenizer,)) as pool:
+                    for batch_titles, tokens, lengths in pool.imap(_tokenize_batch, jobs):
+                        self._write_batch(fout, fout_titles, offsets, title_offsets, batch_titles, tokens, lengths)
+            else:
+                for typecode, batch in jobs:
+                    batch_titles, tokens, lengths = _tokenize(self.tokenizer, typecode, batch)
+                    self._write_batch(fout, fout_titles, offsets, title_offsets, batch_titles, tokens, lengths)
+
+        with open(prefix + '.idx', 'wb') as fout:
+            offsets.tofile(fout)
+        with open(prefix + '.titles.idx', 'wb') as fout:
+            title_offsets.tofile(fout)
+
+        nb_docs = len(offsets) - 1
+        header = {'version': 2, 'dtype': self.dtype, 'nb_docs': nb_docs, 'nb_tokens': offsets[-1],
+                  'metadata': metadata or {}}
+        with open(prefix + '.json', 'w', encoding='utf-8') as fout:
+            json.dump(header, fout, ensure_ascii=False)
+
+        return nb_docs
+
+    @staticmethod
+    def _write_batch(fout, fout_titles, offsets, title_offsets, batch_titles, tokens, lengths):
+        fout.write(tokens)
+        for length in lengths:
+            offsets.append(offsets[-1] + length)
+        for title in batch_titles:
+            title_offsets.append(title_offsets[-1] + fout_titles.write(title.encode('utf-8')))
+
+
+class TokenDataset:
+    """
+    Memory-mapped view on the files written by 'TokenExporter'. Documents are returned as memoryviews on the token
+    array, and titles are decoded on access, so opening a dataset involves no parsing or copying.
+    """
+    def __init__(self, prefix):
+        with open(prefix + '.json', 'r', encoding='utf-8') as fin:
+            self.header = json.load(fin)
+        self.metadata = self.header['metadata']
+        typecode = TokenExporter.DTYPES[self.header['dtype']]
+
+        self._files, self._mms = [], []
+        self.tokens = self._map(prefix + '.bin', typecode)
+        self.offsets = self._map(prefix + '.idx', 'q')
+        self._titles = self._map(prefix + '.titles', 'B')
+        self._title_offsets = self._map(prefix + '.titles.idx', 'q')
+
+    def _map(self, file, typecode):
+        fin = open(file, 'rb')
+        self._files.append(fin)
+        try:
+            mm = mmap.mmap(fin.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files can't be mapped
+            return memoryview(b'').cast(typecode)
+        self._mms.append(mm)
+        return memoryview(mm).cast(typecode)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self):
+        return self.header['nb_docs']
+
+    def __getitem__(self, i):
+        """
+        :return: memoryview of the token ids of document i
+        """
+        if i < 0:
+            i += len(self)
+        return self.tokens[self.offsets[i]:self.offsets[i + 1]]
+
+    def title(self, i):
+        """
+        :return: title of document i
+        """
+        if i < 0:
+            i += len(self)
+        return str(self._titles[self._title_offsets[i]:self._title_offsets[i + 1]], 'utf-8')
+
+    def titles(self):
+        """
+        :return: generator of all titles, in document order
+        """
+        for i in range(len(self)):
+            yield self.title(i)
+
+    def close(self):
+        """
+        Close the files. Mappings that are still referenced by documents returned by '__getitem__' stay open until
+        those are released.
+        """
+        try:
+            for view in (self.tokens, self.offsets, self._titles, self._title_offsets):
+                view.release()
+            for mm in self._mms:
+                try:
+                    mm.close()
+                except BufferError:
+                    pass
+        finally:
+            for fin in self._files:
+                fin.close()
@@ -0,0 +1,97 @@
+import bz2
+import re
+from array import array
+
+
+# Start of a bz2 stream: stream magic, block size, and the magic of the first block
+BZ2_STREAM_START = re.compile(rb'BZh[1-9]1AY&SY')
+
+
+class MultistreamIndex:
+    """
+    Index of a multistream dump, i.e., the contents of the accompanying '...-multistream-index.txt.bz2' file,
+    which has one 'offset:page_id:title' line per page, 'offset' being the position of the bz2 stream holding the page.
+    """
+    def __init__(self, file, b_titles=False):
+        """
+
+        :param file: path to the (bz2 compressed) index file
+        :param b_titles: also keep a title -> stream offset mapping, needed by 'get_offset'
+        """
+        self.offsets = array('q')
+        self.nb_pages = array('q')
+        self.titles = {} if b_titles else None
+
+        with (bz2.open(file, 'rt', encoding='utf-8') if file.endswith('.bz2')
+              else open(file, 'r', encoding='utf-8')) as fin:
+            for line in fin:
+                offset, page_id, title = line.rstrip('\n').split(':', 2)
+                offset = int(offset)
+                if not self.offsets or self.offsets[-1] != offset:
+                    self.offsets.append(offset)
+                    self.nb_pages.append(0)
+                self.nb_pages[-1] += 1
+                if self.titles is not None:
+                    self.titles[title] = offset
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def get_offset(self, title):
+        """
+        Get the offset of the stream holding the page with the given title, or None if there is no such page.
+
+        :param title:
+        :return:
+        """
+        if self.titles is None:
+            raise ValueError("Index was loaded without titles; use b_titles=True.")
+        return self.titles.get(title)
+
+
+def scan_stream_offsets(file, chunk_size=1 << 24):
+    """
+    Find the start offsets of all bz2 streams in a file, without decompressing it. Use this for multistream dumps
+    that come without an index file.
+
+    Note that the magic bytes could, in theory, also show up inside compressed data; callers should be prepared for
+    'decompress_stream' failing on an offset.
+
+    :param file: path to the dump
+    :param chunk_size: number of bytes to read at once
+    :return: array of offsets
+    """
+    offsets = array('q')
+    overlap = 9
+    with open(file, 'rb') as fin:
+        pos, tail = 0, b''
+        while True:
+            chunk = fin.read(chunk_size)
+            if not chunk:
+                break
+            data = tail + chunk
+            for m in BZ2_STREAM_START.finditer(data):
+                offsets.append(pos - len(tail) + m.start())
+            tail = data[-overlap:]
+            pos += len(chunk)
+    return offsets
+
+
+def decompress_stream(fin, offset, read_size=1 << 16):
+    """
+    Decompress the bz2 stream starting at the given offset.
+
+    :param fin: file object of the dump, opened in binary mode
+    :param offset: start offset of the stream
+    :param read_size: number of bytes to read at once
+    :return: decompressed bytes
+    """
+    fin.seek(offset)
+    decompressor = bz2.BZ2Decompressor()
+    res = []
+    while not decompressor.eof:
+        chunk = fin.read(read_size)
+        if not chunk:
+            raise EOFError(f"Stream at offset {offset} ended before the end of its bz2 stream was reached.")
+        res.append(decompressor.decompress(chunk))
+    return b''.join(res)
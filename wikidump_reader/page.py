@@ -0,0 +1,76 @@
+_UNSET = object()
+
+
+class Page:
+    """
+    Lightweight page record, as returned by 'WikiDumpReader.read_page_records'.
+
+    'title', 'id' and 'ns' are plain attributes. 'raw_text' is looked up in the parsed page element, and 'cleaned' is
+    computed with 'WikiDumpReader.clean', the first time they are accessed; both are memoized. Once the raw text has
+    been looked up, the reference to the page element is dropped. 'categories' holds the names of the categories
+    removed while cleaning.
+    """
+    __slots__ = ('title', 'id', 'ns', '_page', '_raw_text', '_cleaned', '_categories', '_cleaner')
+
+    def __init__(self, title, id, ns=None, page=None, raw_text=None, cleaner=None):
+        """
+
+        :param title:
+        :param id: page id
+        :param ns: namespace id
+        :param page: parsed page element the raw text is read from; not needed if raw_text is given
+        :param raw_text: raw text of the page, if already known
+        :param cleaner: class providing 'clean' and 'get_page_text'; defaults to WikiDumpReader
+        """
+        self.title = title
+        self.id = id
+        self.ns = ns
+        self._page = page if raw_text is None else None
+        self._raw_text = raw_text if raw_text is not None or page is None else _UNSET
+        self._cleaned = _UNSET
+        self._categories = None
+        self._cleaner = cleaner
+
+    def __repr__(self):
+        return f"Page(title={self.title!r}, id={self.id!r}, ns={self.ns!r})"
+
+    def _get_cleaner(self):
+        if self._cleaner is None:
+            from wikidump_reader.wikidump_reader import WikiDumpReader
+            self._cleaner = WikiDumpReader
+        return self._cleaner
+
+    @property
+    def raw_text(self):
+        if self._raw_text is _UNSET:
+            try:
+                self._raw_text = self._get_cleaner().get_page_text(self._page)
+            except AttributeError:
+                # Page without revision or text
+                self._raw_text = None
+            self._page = None
+        return self._raw_text
+
+    @property
+    def cleaned(self):
+        """
+        The cleaned text of the page; raises ValueError if the text can't be cleaned, see 'WikiDumpReader.clean'.
+        """
+        if self._cleaned is _UNSET:
+            raw_text = self.raw_text
+            categories = []
+            if raw_text is None:
+                self._cleaned = None
+            else:
+                self._cleaned = self._get_cleaner().clean(raw_text, title=self.title, categories=categories)
+            self._categories = categories
+        return self._cleaned
+
+    @property
+    def categories(self):
+        """
+        The names of the categories of the page, as found while cleaning it; cleans the page if needed.
+        """
+        if self._categories is None:
+            self.cleaned
+        return self._categories
@@ -0,0 +1,204 @@
+import os
+import time
+from collections import Counter
+
+
+class Progress:
+    """
+    Throughput telemetry for 'WikiDumpReader.read_page' (and friends) and 'WikiDumpReader.clean_pages'.
+
+    Keeps track of the number of compressed and decompressed bytes read, the number of pages seen, kept, skipped
+    (per filter reason) and cleaned, and derives pages/s, MB/s and an ETA from the position in the dump. Byte counts
+    add up over all the parts of a split dump; the ETA covers all parts announced with 'expect'. Every
+    'interval' seconds, a snapshot is passed to 'callback' and/or written to 'metrics_file' in the Prometheus text
+    format, so a local scraper can pick it up.
+    """
+    def __init__(self, callback=None, metrics_file=None, interval=10., metrics_prefix='wikidump'):
+        """
+
+        :param callback: callable that gets a snapshot dictionary, see 'snapshot'
+        :param metrics_file: path of the metrics file; rewritten atomically at every report
+        :param interval: min number of seconds between two reports
+        :param metrics_prefix: prefix of the metric names in the metrics file
+        """
+        self.callback = callback
+        self.metrics_file = metrics_file
+        self.interval = interval
+        self.metrics_prefix = metrics_prefix
+
+        self.file = None
+        self.total_bytes = 0
+        self._b_total_known = True
+        self._expected = set()
+        self._fin = None
+        self._fd = None
+        # Bytes read from the parts that are done, and from the current part
+        self._done_compressed_bytes = 0
+        self._done_decompressed_bytes = 0
+        self._compressed_bytes = 0
+        self._decompressed_bytes = 0
+
+        self.nb_seen = 0
+        self.nb_kept = 0
+        self.nb_skipped = Counter()
+        self.nb_cleaned = 0
+        self.start_time = time.monotonic()
+        self._last_report = self.start_time
+
+    def expect(self, files):
+        """
+        Called by the reader before it reads the parts of a split dump, so the total size, and hence the ETA, covers
+        all of them from the start.
+
+        :param files: paths to the parts; file objects are ignored
+        :return:
+        """
+        for file in files:
+            if isinstance(file, (str, os.PathLike)) and file not in self._expected:
+                self._expected.add(file)
+                self.total_bytes += os.path.getsize(file)
+
+    def start(self, file, fin):
+        """
+        Called by the reader when it opens a dump, or the next part of a split dump.
+
+        :param file: path to the dump, or file object
+        :param fin: opened (decompressed) file object
+        :return:
+        """
+        self.file = file if isinstance(file, (str, os.PathLike)) else None
+        self._fin = fin
+        try:
+            self._fd = fin.fileno()
+        except (AttributeError, OSError):
+            self._fd = None
+        self._compressed_bytes, self._decompressed_bytes = 0, 0
+
+        if self.file is not None:
+            if self.file not in self._expected:
+                self.total_bytes += os.path.getsize(self.file)
+        elif self._fd is not None:
+            self.total_bytes += os.fstat(self._fd).st_size
+        else:
+            # Size unknown, e.g., an in-memory file object; no ETA
+            self._b_total_known = False
+
+    def stop(self):
+        """
+        Called by the reader when it is done with the dump, or with a part; reports one last time.
+        """
+        self._update_positions()
+        self._done_compressed_bytes += self._compressed_bytes
+        self._done_decompressed_bytes += self._decompressed_bytes
+        self._compressed_bytes, self._decompressed_bytes = 0, 0
+        self._fin, self._fd = None, None
+        self.report()
+
+    def page(self, reason=None):
+        """
+        Count a page.
+
+        :param reason: reason the page was skipped, or None if it was kept
+        :return:
+        """
+        self.nb_seen += 1
+        if reason is None:
+            self.nb_kept += 1
+        else:
+            self.nb_skipped[reason] += 1
+        self.tick()
+
+    def cleaned(self, nb_pages=1):
+        """
+        Count cleaned pages.
+        """
+        self.nb_cleaned += nb_pages
+        self.tick()
+
+    def tick(self):
+        """
+        Report if the last report is more than 'interval' seconds ago.
+        """
+        if time.monotonic() - self._last_report >= self.interval:
+            self.report()
+
+    def _update_positions(self):
+        if self._fin is None:
+            return
+        try:
+            self._decompressed_bytes = self._fin.tell()
+        except (OSError, ValueError):
+            pass
+        if self._fd is not None:
+            try:
+                self._compressed_bytes = os.lseek(self._fd, 0, os.SEEK_CUR)
+            except OSError:
+                pass
+
+    def snapshot(self):
+        """
+        :return: dictionary with the current counters and rates
+        """
+        self._update_positions()
+        elapsed = max(time.monotonic() - self.start_time, 1e-9)
+        compressed_bytes = self._done_compressed_bytes + self._compressed_bytes
+        decompressed_bytes = self._done_decompressed_bytes + self._decompressed_bytes
+        eta = None
+        if self._b_total_known and 0 < compressed_bytes <= self.total_bytes:
+            eta = elapsed * (self.total_bytes - compressed_bytes) / compressed_bytes
+        return {'file': self.file,
+                'elapsed_s': elapsed,
+                'compressed_bytes': compressed_bytes,
+                'decompressed_bytes': decompressed_bytes,
+                'total_bytes': self.total_bytes,
+                'pages_seen': self.nb_seen,
+                'pages_kept': self.nb_kept,
+                'pages_skipped': dict(self.nb_skipped),
+                'pages_cleaned': self.nb_cleaned,
+                'pages_per_s': self.nb_seen / elapsed,
+                'compressed_mb_per_s': compressed_bytes / elapsed / 1e6,
+                'decompressed_mb_per_s': decompressed_bytes / elapsed / 1e6,
+                'eta_s': eta}
+
+    def report(self):
+        """
+        Pass a snapshot to the callback and write the metrics file.
+        """
+        self._last_report = time.monotonic()
+        snapshot = self.snapshot()
+        if self.callback is not None:
+            self.callback(snapshot)
+        if self.metrics_file is not None:
+            self.write_metrics(snapshot)
+
+    def write_metrics(self, snapshot):
+        """
+        Write a snapshot to the metrics file, in the Prometheus text format.
+
+        :param snapshot:
+        :return:
+        """
+        p = self.metrics_prefix
+        lines = []
+        for name, kind, key in (('elapsed_seconds', 'gauge', 'elapsed_s'),
+                                ('compressed_bytes_read', 'counter', 'compressed_bytes'),
+                                ('decompressed_bytes_read', 'counter', 'decompressed_bytes'),
+                                ('file_bytes', 'gauge', 'total_bytes'),
+                                ('pages_seen', 'counter', 'pages_seen'),
+                                ('pages_kept', 'counter', 'pages_kept'),
+                                ('pages_cleaned', 'counter', 'pages_cleaned'),
+                                ('pages_per_second', 'gauge', 'pages_per_s'),
+                                ('compressed_megabytes_per_second', 'gauge', 'compressed_mb_per_s'),
+                                ('eta_seconds', 'gauge', 'eta_s')):
+            if snapshot[key] is None:
+                continue
+            lines.append(f'# TYPE {p}_{name} {kind}')
+            lines.append(f'{p}_{name} {snapshot[key]}')
+        lines.append(f'# TYPE {p}_pages_skipped counter')
+        for reason, cnt in sorted(snapshot['pages_skipped'].items()):
+            lines.append(f'{p}_pages_skipped{{reason="{reason}"}} {cnt}')
+
+        tmp_file = self.metrics_file + '.tmp'
+        with open(tmp_file, 'w') as fout:
+            fout.write('\n'.join(lines) + '\n')
+        os.replace(tmp_file, self.metrics_file)
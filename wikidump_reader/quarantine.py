@@ -0,0 +1,97 @@
+import json
+import signal
+import threading
+import time
+from contextlib import contextmanager
+
+
+class CleaningTimeout(Exception):
+    """
+    Raised when cleaning a page takes longer than its time budget.
+    """
+    pass
+
+
+@contextmanager
+def time_limit(seconds, title='N/A'):
+    """
+    Raise CleaningTimeout in the wrapped block if it runs for more than seconds (wall clock time).
+
+    The block is interrupted with a SIGALRM timer, which is only possible in the main thread on Unix. Elsewhere, the
+    block runs to completion and CleaningTimeout is raised afterwards if it took too long.
+
+    :param seconds: time budget; None means no limit
+    :param title: title of the page being cleaned; only used for error messaging
+    :return:
+    """
+    if seconds is None:
+        yield
+        return
+
+    def _raise(signum, frame):
+        raise CleaningTimeout(f"Cleaning took more than {seconds}s.\nArticle: [{title}]")
+
+    if hasattr(signal, 'setitimer') and threading.current_thread() is threading.main_thread():
+        prev_handler = signal.signal(signal.SIGALRM, _raise)
+        signal.setitimer(signal.ITIMER_REAL, seconds)
+        try:
+            yield
+        finally:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, prev_handler)
+    else:
+        start = time.monotonic()
+        yield
+        if time.monotonic() - start > seconds:
+            _raise(None, None)
+
+
+class Quarantine:
+    """
+    Side file for pages that could not be cleaned within their time budget, see 'WikiDumpReader.clean_pages'.
+
+    Every quarantined page is appended to 'file' as a json line holding its title and raw text, and counted in
+    'count'.
+    """
+    FALLBACKS = {'light', 'skip'}
+
+    def __init__(self, file=None, fallback='light'):
+        """
+
+        :param file: path of the side file; None to only count quarantined pages
+        :param fallback: what to do with quarantined pages: 'light' returns them cleaned with
+        'WikiDumpReader.clean_light', 'skip' drops them from the output
+        """
+        if fallback not in self.FALLBACKS:
+            raise ValueError(f"Unknown fallback [{fallback}], use one of {sorted(self.FALLBACKS)}.")
+        self.file = file
+        self.fallback = fallback
+        self.count = 0
+        self._fout = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def add(self, title, text):
+        """
+        Quarantine a page.
+
+        :param title:
+        :param text: raw text of the page
+        :return:
+        """
+        self.count += 1
+        if self.file is None:
+            return
+        if self._fout is None:
+            self._fout = open(self.file, 'a', encoding='utf-8')
+        self._fout.write(json.dumps({'title': title, 'text': text}, ensure_ascii=False) + '\n')
+        self._fout.flush()
+
+    def close(self):
+        if self._fout is not None:
+            self._fout.close()
+            self._fout = None
@@ -0,0 +1,205 @@
+import mmap
+import struct
+import zlib
+from array import array
+
+
+class RedirectTable:
+    """
+    Compact, persistent redirect -> canonical title mapping.
+
+    The table is built once from the (title, target) tuples returned by 'WikiDumpReader.read_redirects', with redirect
+    chains collapsed to their final target and cycles dropped. It is written to disk as an open addressing hash table
+    on top of a string blob, and memory-mapped when loaded, so lookups take constant time and the table is shared by
+    all processes opening the same file.
+
+    File layout (native byte order):
+        header: magic, version, nb_strings, nb_slots, nb_entries, nb_cycles
+        string offsets: (nb_strings + 1) * int64
+        slot keys: nb_slots * int64, index of the redirect title in the string table, or -1 for an empty slot
+        slot values: nb_slots * int64, index of the canonical title in the string table
+        string blob: utf-8 encoded titles
+    """
+    MAGIC = b'WDRT'
+    VERSION = 1
+    HEADER = struct.Struct('=4sIqqqq')
+    _CYCLE = -2
+
+    def __init__(self, file):
+        """
+        Open a table previously written by 'RedirectTable.build'.
+
+        :param file: path to the table file
+        """
+        self._fin = open(file, 'rb')
+        self._mm = mmap.mmap(self._fin.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.nb_strings, self.nb_slots, self.nb_entries, self.nb_cycles = \
+            self.HEADER.unpack_from(self._mm, 0)
+        if magic != self.MAGIC or version != self.VERSION:
+            self.close()
+            raise ValueError(f"File [{file}] is not a redirect table.")
+
+        view = memoryview(self._mm)
+        pos = self.HEADER.size
+        self._str_offsets = view[pos:pos + 8 * (self.nb_strings + 1)].cast('q')
+        pos += 8 * (self.nb_strings + 1)
+        self._slot_keys = view[pos:pos + 8 * self.nb_slots].cast('q')
+        pos += 8 * self.nb_slots
+        self._slot_values = view[pos:pos + 8 * self.nb_slots].cast('q')
+        pos += 8 * self.nb_slots
+        self._blob_start = pos
+        self._mask = self.nb_slots - 1
+        view.release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self):
+        return self.nb_entries
+
+    def __contains__(self, title):
+        return self._find(self.normalize_title(title)) is not None
+
+    def close(self):
+        for view in ('_str_offsets', '_slot_keys', '_slot_values'):
+            if hasattr(self, view):
+                getattr(self, view).release()
+                delattr(self, view)
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        self._fin.close()
+
+    def resolve(self, title):
+        """
+        Get the canonical title for a title. Titles that are not redirects are returned as is (normalized).
+
+        :param title:
+        :return: canonical title
+        """
+        title = self.normalize_title(title)
+        value = self._find(title)
+        return title if value is None else self._string(value)
+
+    def _string(self, idx):
+        start, end = self._str_offsets[idx], self._str_offsets[idx + 1]
+        return self._mm[self._blob_start + start:self._blob_start + end].decode('utf-8')
+
+    def _find(self, title):
+        key = title.encode('utf-8')
+        slot = zlib.crc32(key) & self._mask
+        while True:
+            idx = self._slot_keys[slot]
+            if idx < 0:
+                return None
+            start, end = self._str_offsets[idx], self._str_offsets[idx + 1]
+            if end - start == len(key) and self._mm[self._blob_start + start:self._blob_start + end] == key:
+                return self._slot_values[slot]
+            slot = (slot + 1) & self._mask
+
+    @staticmethod
+    def normalize_title(title):
+        """
+        Normalize a title the way MediaWiki does: underscores become spaces, surrounding whitespace is dropped and the
+        first character is capitalized.
+
+        :param title:
+        :return:
+        """
+        title = title.replace('_', ' ').strip()
+        return title[:1].upper() + title[1:]
+
+    @classmethod
+    def build(cls, redirects, file):
+        """
+        Build a redirect table from (title, target) tuples and write it to file.
+
+        Titles are interned to integer ids while reading, so the only per-redirect Python objects kept in memory are
+        the title strings themselves.
+
+        :param redirects: iterable of (title, target) tuples, e.g., WikiDumpReader.read_redirects(dump)
+        :param file: path to write the table to
+        :return: the opened RedirectTable
+        """
+        ids = {}
+        titles = []
+        targets = array('q')
+
+        def _intern(_title):
+            _id = ids.get(_title)
+            if _id is None:
+                _id = ids[_title] = len(titles)
+                titles.append(_title)
+                targets.append(-1)
+            return _id
+
+        for title, target in redirects:
+            src = _intern(cls.normalize_title(title))
+            dst = _intern(cls.normalize_title(target))
+            targets[src] = dst
+        ids = None
+
+        # Collapse chains; a chain that runs into a cycle cannot be resolved and is dropped
+        canonical = array('q', [-1]) * len(titles)
+        nb_cycles = 0
+        for i in range(len(titles)):
+            if targets[i] < 0 or canonical[i] != -1:
+                continue
+            path, on_path = [], set()
+            cur = i
+            while targets[cur] >= 0 and canonical[cur] == -1 and cur not in on_path:
+                path.append(cur)
+                on_path.add(cur)
+                cur = targets[cur]
+            if cur in on_path or canonical[cur] == cls._CYCLE:
+                final = cls._CYCLE
+                nb_cycles += len(path)
+            elif canonical[cur] >= 0:
+                final = canonical[cur]
+            else:
+                final = cur
+            for node in path:
+                canonical[node] = final
+        targets = None
+
+        # Assign string table ids to the titles we need to keep
+        str_ids = array('q', [-1]) * len(titles)
+        str_offsets = array('q', [0])
+        blob = bytearray()
+        nb_entries = 0
+        for i in range(len(titles)):
+            if canonical[i] < 0:
+                continue
+            nb_entries += 1
+            for node in (i, canonical[i]):
+                if str_ids[node] < 0:
+                    str_ids[node] = len(str_offsets) - 1
+                    blob += titles[node].encode('utf-8')
+                    str_offsets.append(len(blob))
+
+        nb_slots = 1
+        while nb_slots < 2 * nb_entries:
+            nb_slots *= 2
+        slot_keys = array('q', [-1]) * nb_slots
+        slot_values = array('q', [-1]) * nb_slots
+        mask = nb_slots - 1
+        for i in range(len(titles)):
+            if canonical[i] < 0:
+                continue
+            slot = zlib.crc32(titles[i].encode('utf-8')) & mask
+            while slot_keys[slot] >= 0:
+                slot = (slot + 1) & mask
+            slot_keys[slot] = str_ids[i]
+            slot_values[slot] = str_ids[canonical[i]]
+
+        with open(file, 'wb') as fout:
+            fout.write(cls.HEADER.pack(cls.MAGIC, cls.VERSION, len(str_offsets) - 1, nb_slots, nb_entries, nb_cycles))
+            str_offsets.tofile(fout)
+            slot_keys.tofile(fout)
+            slot_values.tofile(fout)
+            fout.write(blob)
+
+        return cls(file)
@@ -0,0 +1,97 @@
+import random
+
+from wikidump_reader.multistream import MultistreamIndex, decompress_stream, scan_stream_offsets
+from wikidump_reader.wikidump_reader import WikiDumpReader
+
+
+class PageSampler:
+    """
+    Draw random samples of pages from a dump.
+
+    For multistream dumps, 'sample' only decompresses a random selection of streams, and samples pages within those.
+    For single stream dumps, 'reservoir_sample' draws a uniform sample in a single pass over the dump.
+    """
+    # Multistream dumps hold 100 pages per stream
+    PAGES_PER_STREAM = 100
+
+    def __init__(self, reader=None, seed=0):
+        """
+
+        :param reader: WikiDumpReader to use; defaults to WikiDumpReader()
+        :param seed: seed of the random generator; samples are reproducible for a given seed
+        """
+        self.reader = WikiDumpReader() if reader is None else reader
+        self.seed = seed
+
+    def sample(self, file, fraction, index_file=None, pages_per_stream=10, **kwargs):
+        """
+        Sample about fraction * (number of pages) pages from a multistream dump.
+
+        Streams are drawn in random order, and up to pages_per_stream pages are sampled from each drawn stream, until
+        the sample is complete or all streams have been used. Streams are drawn in rounds, each round holding just
+        enough streams to complete the sample, given the number of pages per stream; streams that yield fewer pages,
+        e.g., because of filters, are made up for in the next round. Lower values of pages_per_stream spread the
+        sample over more streams, at the cost of decompressing more data.
+
+        :param file: path to the multistream dump
+        :param fraction: fraction of the pages to sample
+        :param index_file: path to the multistream index file; if None, the stream offsets are found by scanning
+        the dump, and every stream is assumed to hold PAGES_PER_STREAM pages
+        :param pages_per_stream: max number of pages to sample from a single stream
+        :param kwargs: filters, see 'WikiDumpReader.read_page'
+        :return: generator of (title, text) tuples, in dump order within every round
+        """
+        rng = random.Random(self.seed)
+        if index_file is not None:
+            index = MultistreamIndex(index_file)
+            offsets, stream_sizes = index.offsets, index.nb_pages
+        else:
+            offsets = scan_stream_offsets(file)
+            stream_sizes = [self.PAGES_PER_STREAM] * len(offsets)
+
+        nb_samples = round(fraction * sum(stream_sizes))
+        remaining = list(range(len(offsets)))
+        rng.shuffle(remaining)
+
+        with open(file, 'rb') as fin:
+            while nb_samples > 0 and remaining:
+                # Draw just enough streams to complete the sample, if they all hold as many pages as expected
+                streams, expected = [], 0
+                while expected < nb_samples and remaining:
+                    stream = remaining.pop()
+                    streams.append(stream)
+                    expected += min(stream_sizes[stream], pages_per_stream)
+
+                for stream in sorted(streams):
+                    if nb_samples <= 0:
+                        break
+                    try:
+                        data = decompress_stream(fin, offsets[stream])
+                    except (OSError, EOFError) as e:
+                        print(f"Could not decompress stream at offset {offsets[stream]}, skipping: {e}")
+                        continue
+                    pages = list(self.reader.read_page_fragment(data, **kwargs))
+                    nb = min(len(pages), pages_per_stream, nb_samples)
+                    for i in sorted(rng.sample(range(len(pages)), nb)):
+                        yield pages[i]
+                    nb_samples -= nb
+
+    def reservoir_sample(self, file, k, **kwargs):
+        """
+        Draw a uniform sample of k pages in a single pass over the dump; use this for dumps that are not multistream.
+
+        :param file: path to the dump
+        :param k: sample size
+        :param kwargs: filters, see 'WikiDumpReader.read_page'
+        :return: list of (title, text) tuples, in dump order
+        """
+        rng = random.Random(self.seed)
+        reservoir = []
+        for i, page in enumerate(self.reader.read_page(file, **kwargs)):
+            if i < k:
+                reservoir.append((i, page))
+            else:
+                j = rng.randint(0, i)
+                if j < k:
+                    reservoir[j] = (i, page)
+        return [page for i, page in sorted(reservoir)]
@@ -0,0 +1,201 @@
+import json
+import socketserver
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from wikidump_reader.multistream import MultistreamIndex, decompress_stream
+from wikidump_reader.wikidump_reader import WikiDumpReader
+
+
+class LRUCache:
+    """
+    Least recently used cache, bounded by the total size of its values, as computed by size_fn.
+    """
+    def __init__(self, max_size, size_fn=len):
+        self.max_size = max_size
+        self.size_fn = size_fn
+        self.size = 0
+        self._data = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, default=None):
+        try:
+            self._data.move_to_end(key)
+        except KeyError:
+            return default
+        return self._data[key][0]
+
+    def put(self, key, value):
+        size = self.size_fn(value)
+        if key in self._data:
+            self.size -= self._data.pop(key)[1]
+        if size > self.max_size:
+            return
+        self._data[key] = (value, size)
+        self.size += size
+        while self.size > self.max_size:
+            self.size -= self._data.popitem(last=False)[1][1]
+
+
+class ArticleLookup:
+    """
+    Look up the (cleaned) text of articles by title in a multistream dump.
+
+    The index is loaded once. Every stream needed to answer a lookup is decompressed and parsed as a whole, and all
+    its pages are kept in an LRU cache of decoded blocks, so neighbouring pages come for free. Cleaned pages are kept
+    in a second LRU cache. Both caches are bounded by the number of characters they hold.
+    """
+    def __init__(self, file, index_file, reader=None, block_cache_size=1 << 28, page_cache_size=1 << 28):
+        """
+
+        :param file: path to the multistream dump
+        :param index_file: path to the multistream index
+        :param reader: WikiDumpReader to use; defaults to WikiDumpReader()
+        :param block_cache_size: max number of characters in the decoded block cache
+        :param page_cache_size: max number of characters in the cleaned page cache
+        """
+        self.file = file
+        self.index = MultistreamIndex(index_file, b_titles=True)
+        self.reader = WikiDumpReader() if reader is None else reader
+        self.blocks = LRUCache(block_cache_size, size_fn=lambda pages: sum(map(len, pages.values())))
+        self.pages = LRUCache(page_cache_size)
+        self._lock = threading.Lock()
+
+    def _get_block(self, offset):
+        """
+        Get the pages of the stream at offset, as a {title: raw text} dictionary.
+        """
+        with self._lock:
+            block = self.blocks.get(offset)
+        if block is None:
+            with open(self.file, 'rb') as fin:
+                data = decompress_stream(fin, offset)
+            block = dict(self.reader.read_page_fragment(data))
+            with self._lock:
+                self.blocks.put(offset, block)
+        return block
+
+    def get_raw(self, title):
+        """
+        Get the raw text of an article, or None if there is no article with that title.
+
+        :param title:
+        :return:
+        """
+        offset = self.index.get_offset(title)
+        if offset is None:
+            return None
+        return self._get_block(offset).get(title)
+
+    def get(self, title):
+        """
+        Get the cleaned text of an article, or None if there is no article with that title.
+
+        :param title:
+        :return:
+        """
+        with self._lock:
+            text = self.pages.get(title)
+        if text is not None:
+            return text
+
+        text = self.get_raw(title)
+        if text is None:
+            return None
+        try:
+            text = self.reader.clean(text, title=title)
+        except ValueError as e:
+            print(e)
+            return None
+        with self._lock:
+            self.pages.put(title, text)
+        return text
+
+    def get_many(self, titles, b_clean=True):
+        """
+        Look up several articles at once; titles are grouped per stream, so every stream is decoded at most once.
+
+        :param titles:
+        :param b_clean: return cleaned texts; if False, return raw texts
+        :return: {title: text or None} dictionary
+        """
+        titles = list(titles)
+        for offset in sorted({self.index.get_offset(title) for title in titles} - {None}):
+            self._get_block(offset)
+        return {title: self.get(title) if b_clean else self.get_raw(title) for title in titles}
+
+
+class LookupRequestHandler(BaseHTTPRequestHandler):
+    """
+    HTTP interface for 'ArticleLookup':
+        GET /page?title=X[&raw=1]: text/plain text of article X, or 404
+        POST /pages[?raw=1] with a json list of titles: json {title: text or null} object
+    """
+    lookup = None
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        if url.path != '/page' or 'title' not in params:
+            self.send_error(404)
+            return
+        title = params['title'][0]
+        text = self.lookup.get_raw(title) if params.get('raw') == ['1'] else self.lookup.get(title)
+        if text is None:
+            self.send_error(404, f"No article titled [{title}]")
+            return
+        self._send(text.encode('utf-8'), 'text/plain; charset=utf-8')
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != '/pages':
+            self.send_error(404)
+            return
+        try:
+            titles = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+        except ValueError:
+            titles = None
+        if not isinstance(titles, list) or not all(isinstance(title, str) for title in titles):
+            self.send_error(400, "Expected a json list of titles")
+            return
+        res = self.lookup.get_many(titles, b_clean=parse_qs(url.query).get('raw') != ['1'])
+        self._send(json.dumps(res, ensure_ascii=False).encode('utf-8'), 'application/json; charset=utf-8')
+
+    def _send(self, body, content_type):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self):
+        # Unix sockets have no (host, port) address
+        return self.client_address[0] if isinstance(self.client_address, tuple) else 'unix'
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def make_server(lookup, address=('127.0.0.1', 8000)):
+    """
+    Create an HTTP server answering lookups; call 'serve_forever' on the result to start serving.
+
+    :param lookup: ArticleLookup object
+    :param address: (host, port) tuple for a TCP server, or a path for a Unix socket server
+    :return: server object
+    """
+    handler = type('_LookupRequestHandler', (LookupRequestHandler,), {'lookup': lookup})
+    if isinstance(address, str):
+        return ThreadingUnixHTTPServer(address, handler)
+    return ThreadingHTTPServer(address, handler)
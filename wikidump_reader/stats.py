@@ -0,0 +1,120 @@
+import json
+from array import array
+from collections import Counter
+
+
+class CorpusStats:
+    """
+    Mergeable corpus statistics: page, word and character counts, character and word (vocabulary) frequencies and a
+    histogram of article lengths (in words).
+
+    Statistics are computed per batch, e.g., in worker processes by 'WikiDumpReader.clean_pages', and combined with
+    'merge'. If top_k is set, the vocabulary is pruned to the top_k most frequent words every time it grows past
+    2 * top_k, which keeps memory bounded; the counts of the retained words are then lower bounds.
+    """
+    def __init__(self, top_k=None, bin_width=100, nb_bins=1000):
+        """
+
+        :param top_k: max number of words to keep in the vocabulary; None to keep all of them
+        :param bin_width: width, in words, of the article length histogram bins
+        :param nb_bins: number of histogram bins; the last bin also holds all longer articles
+        """
+        self.top_k = top_k
+        self.bin_width = bin_width
+        self.nb_bins = nb_bins
+
+        self.nb_pages = 0
+        self.nb_words = 0
+        self.nb_chars = 0
+        self.char_counts = Counter()
+        self.word_counts = Counter()
+        self.length_hist = array('q', [0]) * nb_bins
+
+    def empty_like(self):
+        """
+        Get a new, empty, CorpusStats object with the same settings as this one.
+
+        :return:
+        """
+        return self.__class__(top_k=self.top_k, bin_width=self.bin_width, nb_bins=self.nb_bins)
+
+    def update(self, text):
+        """
+        Add a (cleaned) article to the statistics.
+
+        :param text:
+        :return:
+        """
+        words = text.split()
+        self.nb_pages += 1
+        self.nb_words += len(words)
+        self.nb_chars += len(text)
+        self.char_counts.update(text)
+        self.word_counts.update(words)
+        self.length_hist[min(len(words) // self.bin_width, self.nb_bins - 1)] += 1
+        if self.top_k is not None and len(self.word_counts) > 2 * self.top_k:
+            self.prune()
+
+    def merge(self, other):
+        """
+        Add the statistics of another CorpusStats object to this one.
+
+        :param other:
+        :return: self
+        """
+        if other.bin_width != self.bin_width or other.nb_bins != self.nb_bins:
+            raise ValueError("Can't merge statistics with different histogram settings.")
+        self.nb_pages += other.nb_pages
+        self.nb_words += other.nb_words
+        self.nb_chars += other.nb_chars
+        self.char_counts.update(other.char_counts)
+        self.word_counts.update(other.word_counts)
+        for i, cnt in enumerate(other.length_hist):
+            self.length_hist[i] += cnt
+        if self.top_k is not None and len(self.word_counts) > 2 * self.top_k:
+            self.prune()
+        return self
+
+    def prune(self, top_k=None):
+        """
+        Only keep the top_k most frequent words in the vocabulary.
+
+        :param top_k: defaults to self.top_k
+        :return:
+        """
+        top_k = self.top_k if top_k is None else top_k
+        if top_k is not None and len(self.word_counts) > top_k:
+            self.word_counts = Counter(dict(self.word_counts.most_common(top_k)))
+
+    def to_dict(self):
+        return {'top_k': self.top_k, 'bin_width': self.bin_width, 'nb_bins': self.nb_bins,
+                'nb_pages': self.nb_pages, 'nb_words': self.nb_words, 'nb_chars': self.nb_chars,
+                'vocabulary_size': len(self.word_counts),
+                'length_hist': self.length_hist.tolist(),
+                'char_counts': dict(self.char_counts.most_common()),
+                'word_counts': dict(self.word_counts.most_common())}
+
+    @classmethod
+    def from_dict(cls, d):
+        stats = cls(top_k=d['top_k'], bin_width=d['bin_width'], nb_bins=d['nb_bins'])
+        stats.nb_pages, stats.nb_words, stats.nb_chars = d['nb_pages'], d['nb_words'], d['nb_chars']
+        stats.length_hist = array('q', d['length_hist'])
+        stats.char_counts = Counter(d['char_counts'])
+        stats.word_counts = Counter(d['word_counts'])
+        return stats
+
+    def write(self, file):
+        """
+        Write the statistics to a json file.
+
+        :param file:
+        :return:
+        """
+        self.prune()
+        with open(file, 'w', encoding='utf-8') as fout:
+            json.dump(self.to_dict(), fout, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, file):
+        with open(file, 'r', encoding='utf-8') as fin:
+            return cls.from_dict(json.load(fin))
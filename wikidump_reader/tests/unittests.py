@@ -1,7 +1,90 @@
+import asyncio
+import bz2
+import io
+import json
+import os
+import socket
+import tempfile
+import threading
+import time
 import unittest
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from xml.sax.saxutils import escape, quoteattr
+
+from wikidump_reader.aio import AsyncWikiDumpReader
+from wikidump_reader.batch import PageBatch
+from wikidump_reader.categories import CategoryIndex, CategoryIndexWriter
+from wikidump_reader.export import TokenDataset, TokenExporter
+from wikidump_reader.multistream import MultistreamIndex, scan_stream_offsets
+from wikidump_reader.progress import Progress
+from wikidump_reader.quarantine import Quarantine
+from wikidump_reader.redirects import RedirectTable
+from wikidump_reader.sampler import PageSampler
+from wikidump_reader.server import ArticleLookup, LRUCache, make_server
+from wikidump_reader.stats import CorpusStats
 from wikidump_reader.wikidump_reader import WikiDumpReader
 
 
+def make_dump(file, pages, b_bz2=True, first_id=1):
+    """
+    Write a small dump to file.
+
+    :param file:
+    :param pages: list of (title, text) or (title, text, redirect_target) tuples
+    :param b_bz2: compress the dump
+    :param first_id: page id of the first page
+    :return: file
+    """
+    xml = '<mediawiki xmlns="http://www.mediawiki.org/xml/export-0.10/" version="0.10">\n' \
+          '  <siteinfo>\n    <sitename>Wikipedia</sitename>\n  </siteinfo>\n'
+    for page_id, page in enumerate(pages, start=first_id):
+        title, text = page[:2]
+        redirect = f'    <redirect title={quoteattr(page[2])} />\n' if len(page) > 2 else ''
+        xml += f'  <page>\n    <title>{escape(title)}</title>\n    <ns>0</ns>\n    <id>{page_id}</id>\n' \
+               f'{redirect}    <revision>\n      <id>{100 + page_id}</id>\n' \
+               f'      <text xml:space="preserve">{escape(text)}</text>\n    </revision>\n  </page>\n'
+    xml += '</mediawiki>\n'
+    with (bz2.open(file, 'wb') if b_bz2 else open(file, 'wb')) as fout:
+        fout.write(xml.encode('utf-8'))
+    return file
+
+
+def make_multistream_dump(file, index_file, pages, pages_per_stream=3):
+    """
+    Write a small multistream dump, i.e., a dump made of one bz2 stream per pages_per_stream pages, and its index.
+
+    :param file:
+    :param index_file:
+    :param pages: list of (title, text) tuples
+    :param pages_per_stream:
+    :return: (file, index_file)
+    """
+    streams = ['<mediawiki xmlns="http://www.mediawiki.org/xml/export-0.10/" version="0.10">\n'
+               '  <siteinfo>\n    <sitename>Wikipedia</sitename>\n  </siteinfo>\n']
+    index = []
+    for start in range(0, len(pages), pages_per_stream):
+        xml = ''
+        for page_id, (title, text) in enumerate(pages[start:start + pages_per_stream], start=start + 1):
+            xml += f'  <page>\n    <title>{escape(title)}</title>\n    <ns>0</ns>\n    <id>{page_id}</id>\n' \
+                   f'    <revision>\n      <text xml:space="preserve">{escape(text)}</text>\n    </revision>\n' \
+                   f'  </page>\n'
+            index.append((len(streams), page_id, title))
+        streams.append(xml)
+    streams.append('</mediawiki>\n')
+
+    offsets = [0]
+    with open(file, 'wb') as fout:
+        for stream in streams:
+            fout.write(bz2.compress(stream.encode('utf-8')))
+            offsets.append(fout.tell())
+    with bz2.open(index_file, 'wt', encoding='utf-8') as fout:
+        for stream, page_id, title in index:
+            fout.write(f'{offsets[stream]}:{page_id}:{title}\n')
+    return file, index_file
+
+
 class TestWikiDumpReader(unittest.TestCase):
     def test_convert_html_ents(self):
         text = "' ' = &nbsp;\n" \
@@ -155,3 +238,655 @@ class TestWikiDumpReader(unittest.TestCase):
         self.assertEqual(target, WikiDumpReader.remove_refs(text))
         self.assertEqual('This string has no refs',
                          WikiDumpReader.remove_dbl_curlies('This string has no refs'))
+
+
+class TestRedirects(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.dump = make_dump(os.path.join(self.tmp_dir.name, 'dump.xml.bz2'), [
+            ('Allen Ginsberg', 'A poet, see [[Beat generation|the Beats]] and [[Howl]].'),
+            ('Beat generation', '#REDIRECT [[Beat Generation#History]]'),
+            ('Beat Generation', 'A literary movement.'),
+            ('Howl', '#REDIRECT [[Howl (poem)]]', 'Howl (poem)'),
+            ('Howl (poem)', '#REDIRECT [[Howl and Other Poems]]'),
+            ('Loop A', '#REDIRECT [[Loop B]]'),
+            ('Loop B', '#REDIRECT [[Loop A]]'),
+        ])
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_read_redirects(self):
+        self.assertEqual([('Beat generation', 'Beat Generation'), ('Howl', 'Howl (poem)'),
+                          ('Howl (poem)', 'Howl and Other Poems'), ('Loop A', 'Loop B'), ('Loop B', 'Loop A')],
+                         list(WikiDumpReader().read_redirects(self.dump)))
+
+    def test_redirect_table(self):
+        file = os.path.join(self.tmp_dir.name, 'redirects.bin')
+        with RedirectTable.build(WikiDumpReader().read_redirects(self.dump), file) as table:
+            self.assertEqual(3, len(table))
+            self.assertEqual(2, table.nb_cycles)
+            self.assertEqual('Howl and Other Poems', table.resolve('Howl'))
+            self.assertEqual('Howl and Other Poems', table.resolve('howl_(poem)'))
+            self.assertEqual('Beat Generation', table.resolve('Beat generation'))
+            self.assertEqual('Loop A', table.resolve('Loop A'))
+            self.assertEqual('Allen Ginsberg', table.resolve('Allen Ginsberg'))
+            self.assertNotIn('Allen Ginsberg', table)
+
+        with RedirectTable(file) as table:
+            links = []
+            text = WikiDumpReader.clean('A poet, see [[Beat generation|the Beats]] and [[Howl]].',
+                                        redirects=table, links=links)
+            self.assertEqual('A poet, see the Beats and Howl.', text)
+            self.assertEqual(['Beat Generation', 'Howl and Other Poems'], links)
+            with self.assertRaises(ValueError):
+                WikiDumpReader.clean('See [[Howl]].', redirects=table)
+
+        # Targets are normalized the same way with or without a redirect table
+        links = []
+        WikiDumpReader.process_links('[[beat_generation|the Beats]] and [[Howl#Text]].', links=links)
+        self.assertEqual(['Beat generation', 'Howl'], links)
+
+
+class TestCorpusStats(unittest.TestCase):
+    def test_update_merge(self):
+        stats = CorpusStats(bin_width=2, nb_bins=3)
+        stats.update("a b a")
+        other = stats.empty_like()
+        other.update("c a b a c d e")
+        stats.merge(other)
+        self.assertEqual(2, stats.nb_pages)
+        self.assertEqual(10, stats.nb_words)
+        self.assertEqual(18, stats.nb_chars)
+        self.assertEqual(4, stats.word_counts['a'])
+        self.assertEqual(8, stats.char_counts[' '])
+        self.assertEqual([0, 1, 1], stats.length_hist.tolist())
+        stats.prune(top_k=2)
+        self.assertEqual({'a': 4, 'b': 2}, dict(stats.word_counts))
+
+    def test_clean_pages(self):
+        pages = [(f'Page {i}', f"Page [[number]] {i}.{{{{Infobox}}}}\n[[Category:Numbers]]") for i in range(25)]
+        stats = CorpusStats()
+        res = list(WikiDumpReader.clean_pages(pages, nb_workers=2, batch_size=4, stats=stats))
+        self.assertEqual([(f'Page {i}', f"Page number {i}.\n") for i in range(25)], res)
+        self.assertEqual(25, stats.nb_pages)
+        self.assertEqual(25, stats.word_counts['number'])
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            stats.write(os.path.join(tmp_dir, 'stats.json'))
+            self.assertEqual(stats.to_dict(), CorpusStats.load(os.path.join(tmp_dir, 'stats.json')).to_dict())
+
+    def test_clean_pages_read_ahead(self):
+        pulled, threads = [], set()
+
+        def _pages():
+            for i in range(2000):
+                pulled.append(i)
+                threads.add(threading.current_thread())
+                yield f'Page {i}', f'Text {i}'
+
+        cleaned = WikiDumpReader.clean_pages(_pages(), nb_workers=2, batch_size=10)
+        self.assertEqual(('Page 0', 'Text 0'), next(cleaned))
+        time.sleep(0.5)
+        # At most 2 * nb_workers batches are in flight; pages are read in the consumer's thread
+        self.assertLessEqual(len(pulled), 2 * 2 * 10)
+        cleaned.close()
+        self.assertEqual({threading.current_thread()}, threads)
+
+
+class TestReadHistory(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        xml = '<mediawiki xmlns="http://www.mediawiki.org/xml/export-0.10/" version="0.10">\n'
+        for title, texts in (('Howl', ['v1', 'v2', 'v3']), ('Template:Poem', ['t1', 't2']), ('Kaddish', ['k1'])):
+            xml += f'<page><title>{title}</title><ns>0</ns><id>1</id>'
+            for i, text in enumerate(texts):
+                xml += f'<revision><id>{i}</id><timestamp>2001-01-0{i + 1}T00:00:00Z</timestamp>' \
+                       f'<text xml:space="preserve">{text}</text></revision>'
+            xml += '</page>\n'
+        xml += '</mediawiki>\n'
+        self.dump = os.path.join(self.tmp_dir.name, 'history.xml.bz2')
+        with bz2.open(self.dump, 'wb') as fout:
+            fout.write(xml.encode('utf-8'))
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_latest_only(self):
+        wr = WikiDumpReader()
+        self.assertEqual([('Howl', 'v3'), ('Template:Poem', 't2'), ('Kaddish', 'k1')],
+                         list(wr.read_history(self.dump, b_latest_only=True)))
+        self.assertEqual([('Howl', 'v3'), ('Kaddish', 'k1')],
+                         list(wr.read_history(self.dump, b_latest_only=True, b_ignore_template=True)))
+        # read_page only sees the first revision
+        self.assertEqual(('Howl', 'v1'), next(wr.read_page(self.dump)))
+
+    def test_all_revisions(self):
+        self.assertEqual([('Howl', '0', '2001-01-01T00:00:00Z', 'v1'),
+                          ('Howl', '1', '2001-01-02T00:00:00Z', 'v2'),
+                          ('Howl', '2', '2001-01-03T00:00:00Z', 'v3'),
+                          ('Kaddish', '0', '2001-01-01T00:00:00Z', 'k1')],
+                         list(WikiDumpReader().read_history(self.dump, b_ignore_template=True)))
+
+
+class TestPageBatches(unittest.TestCase):
+    def test_read_page_batches(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            pages = [('Howl', 'I saw the best minds'), ('Template:Poem', '{{poem}}'), ('Kaddish', 'Strange now'),
+                     ('Café', 'Ünïcödé text')]
+            dump = make_dump(os.path.join(tmp_dir, 'dump.xml.bz2'), pages)
+            batches = list(WikiDumpReader().read_page_batches(dump, batch_size=2, b_ignore_template=True))
+
+        self.assertEqual([2, 1], [len(batch) for batch in batches])
+        self.assertEqual([1, 3], batches[0].ids.tolist())
+        self.assertEqual(['Howl', 'Kaddish'], batches[0].titles)
+        self.assertEqual(b'Strange now', bytes(batches[0].text_view(1)))
+        self.assertEqual([(4, 'Café', 'Ünïcödé text')], list(batches[1]))
+
+        batch = PageBatch.from_buffer(batches[0].to_bytes())
+        self.assertEqual(list(batches[0]), list(batch))
+
+        shm = batches[1].to_shared_memory()
+        try:
+            batch = PageBatch.from_buffer(shm.buf)
+            self.assertEqual([(4, 'Café', 'Ünïcödé text')], list(batch))
+            del batch
+        finally:
+            shm.close()
+            shm.unlink()
+
+
+class TestPageSampler(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.pages = [(f'Page {i}', f'Text {i}') for i in range(30)] + [('Template:T', 'Template text')]
+        self.dump, self.index = make_multistream_dump(os.path.join(self.tmp_dir.name, 'dump-multistream.xml.bz2'),
+                                                      os.path.join(self.tmp_dir.name, 'dump-index.txt.bz2'),
+                                                      self.pages)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_offsets(self):
+        index = MultistreamIndex(self.index, b_titles=True)
+        self.assertEqual(11, len(index))
+        self.assertEqual(31, sum(index.nb_pages))
+        scanned = scan_stream_offsets(self.dump)
+        self.assertEqual(13, len(scanned))
+        self.assertEqual(index.offsets.tolist(), scanned[1:-1].tolist())
+        self.assertEqual(index.offsets[1], index.get_offset('Page 5'))
+
+    def test_sample(self):
+        sample = list(PageSampler(seed=1).sample(self.dump, 0.2, index_file=self.index, pages_per_stream=2))
+        self.assertEqual(6, len(sample))
+        self.assertTrue(all(page in self.pages for page in sample))
+        self.assertEqual(sample, list(PageSampler(seed=1).sample(self.dump, 0.2, index_file=self.index,
+                                                                 pages_per_stream=2)))
+
+        sample = list(PageSampler(seed=2).sample(self.dump, 1., pages_per_stream=3, b_ignore_template=True))
+        self.assertEqual(self.pages[:-1], sample)
+
+    def test_sample_short_streams(self):
+        # Streams of 3, 3, 3 and 1 pages; short and filtered streams are made up for by drawing more streams
+        pages = self.pages[:9] + [('Template:T', 'Template text')]
+        dump, index = make_multistream_dump(os.path.join(self.tmp_dir.name, 'short-multistream.xml.bz2'),
+                                            os.path.join(self.tmp_dir.name, 'short-index.txt.bz2'), pages)
+        for seed in range(5):
+            sample = list(PageSampler(seed=seed).sample(dump, 1., index_file=index))
+            self.assertEqual(pages, sorted(sample, key=pages.index))
+            sample = list(PageSampler(seed=seed).sample(dump, 0.9, index_file=index, pages_per_stream=3,
+                                                        b_ignore_template=True))
+            self.assertEqual(9, len(set(sample)))
+
+    def test_reservoir_sample(self):
+        sample = PageSampler(seed=1).reservoir_sample(self.dump, 5, b_ignore_template=True)
+        self.assertEqual(5, len(sample))
+        self.assertEqual(len(set(sample)), 5)
+        self.assertTrue(all(page in self.pages[:-1] for page in sample))
+        self.assertEqual(sample, PageSampler(seed=1).reservoir_sample(self.dump, 5, b_ignore_template=True))
+
+
+def char_tokenizer(text):
+    return [ord(c) for c in text]
+
+
+class TestTokenExport(unittest.TestCase):
+    def test_export(self):
+        pages = [(f'Page {i}', f"Text [[number]] {i}" * i) for i in range(9)] + [('Pagé 9', "Text number 9" * 9)]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            prefix = os.path.join(tmp_dir, 'tokens')
+            exporter = TokenExporter(char_tokenizer, dtype='uint16', nb_workers=2, batch_size=3)
+            nb_docs = exporter.export(WikiDumpReader.clean_pages(pages), prefix, metadata={'tokenizer': 'chars'})
+            self.assertEqual(10, nb_docs)
+
+            with TokenDataset(prefix) as dataset:
+                self.assertEqual(10, len(dataset))
+                self.assertEqual([f'Page {i}' for i in range(9)] + ['Pagé 9'], list(dataset.titles()))
+                self.assertEqual('Pagé 9', dataset.title(-1))
+                self.assertEqual({'tokenizer': 'chars'}, dataset.metadata)
+                self.assertEqual([], dataset[0].tolist())
+                self.assertEqual(char_tokenizer("Text number 3" * 3), dataset[3].tolist())
+                self.assertEqual(char_tokenizer("Text number 9" * 9), dataset[-1].tolist())
+                self.assertEqual(sum(13 * i for i in range(10)), len(dataset.tokens))
+
+            TokenExporter(char_tokenizer, dtype='uint16', batch_size=3).export(WikiDumpReader.clean_pages(pages),
+                                                                              prefix + '_1')
+            with TokenDataset(prefix) as dataset, TokenDataset(prefix + '_1') as dataset_1:
+                self.assertEqual(dataset.tokens.tolist(), dataset_1.tokens.tolist())
+                self.assertEqual(dataset.offsets.tolist(), dataset_1.offsets.tolist())
+
+            with open(prefix + '.json', encoding='utf-8') as fin:
+                self.assertNotIn('titles', json.load(fin))
+
+            # Closing while a document is still in use closes the files, and leaves the document readable
+            dataset = TokenDataset(prefix)
+            doc = dataset[3]
+            dataset.close()
+            self.assertTrue(all(fin.closed for fin in dataset._files))
+            self.assertEqual(char_tokenizer("Text number 3" * 3), doc.tolist())
+
+
+class TestProgress(unittest.TestCase):
+    def test_progress(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            dump = make_dump(os.path.join(tmp_dir, 'dump.xml.bz2'), [
+                ('Howl', 'I saw the best minds of my generation'), ('Template:Poem', '{{poem}}'),
+                ('Beat', '#REDIRECT [[Beat Generation]]'), ('Kaddish', 'Strange now')])
+            snapshots = []
+            metrics_file = os.path.join(tmp_dir, 'metrics.prom')
+            progress = Progress(callback=snapshots.append, metrics_file=metrics_file, interval=0.)
+            pages = WikiDumpReader().read_page(dump, b_ignore_template=True, b_ignore_redirs=True, progress=progress)
+            self.assertEqual(2, len(list(WikiDumpReader.clean_pages(pages, progress=progress))))
+
+            snapshot = snapshots[-1]
+            self.assertEqual(4, snapshot['pages_seen'])
+            self.assertEqual(2, snapshot['pages_kept'])
+            self.assertEqual(2, snapshot['pages_cleaned'])
+            self.assertEqual({'template': 1, 'redirect': 1}, snapshot['pages_skipped'])
+            self.assertEqual(os.path.getsize(dump), snapshot['total_bytes'])
+            self.assertEqual(os.path.getsize(dump), snapshot['compressed_bytes'])
+            self.assertEqual(0., snapshot['eta_s'])
+            self.assertGreater(snapshot['decompressed_bytes'], snapshot['compressed_bytes'])
+
+            with open(metrics_file) as fin:
+                metrics = fin.read()
+            self.assertIn('wikidump_pages_seen 4\n', metrics)
+            self.assertIn('wikidump_pages_skipped{reason="redirect"} 1\n', metrics)
+
+    def test_progress_parts(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            parts = [make_dump(os.path.join(tmp_dir, f'pages-articles{part}.xml.bz2'),
+                               [(f'Page {part}.{i}', f'Text {i}') for i in range(20)]) for part in (1, 2, 3)]
+            total_bytes = sum(map(os.path.getsize, parts))
+            snapshots = []
+            progress = Progress(callback=snapshots.append, interval=0.)
+            self.assertEqual(60, len(list(WikiDumpReader().read_page(parts, progress=progress))))
+            # The total covers all parts from the start, while the byte counts add up over the parts
+            self.assertEqual([total_bytes] * len(snapshots), [snapshot['total_bytes'] for snapshot in snapshots])
+            self.assertEqual(total_bytes, snapshots[-1]['compressed_bytes'])
+            self.assertGreater(snapshots[0]['eta_s'], 0.)
+            self.assertEqual(0., snapshots[-1]['eta_s'])
+
+            # File objects have no path; their size is taken from the file descriptor, if there is one
+            progress = Progress(callback=snapshots.append, interval=0.)
+            with open(parts[0], 'rb') as fin:
+                self.assertEqual(20, len(list(WikiDumpReader().read_page(fin, progress=progress))))
+            self.assertEqual(os.path.getsize(parts[0]), snapshots[-1]['total_bytes'])
+            self.assertEqual(0., snapshots[-1]['eta_s'])
+
+            progress = Progress(callback=snapshots.append, interval=0.)
+            with open(parts[0], 'rb') as fin:
+                data = io.BytesIO(fin.read())
+            self.assertEqual(20, len(list(WikiDumpReader().read_page(data, progress=progress))))
+            self.assertIsNone(snapshots[-1]['eta_s'])
+
+
+class StalledWikiDumpReader(WikiDumpReader):
+    def read_page(self, file, **kwargs):
+        yield next(super().read_page(file, **kwargs))
+        time.sleep(60)
+
+
+class TestAsyncWikiDumpReader(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.pages = [(f'Page {i}', f'Text [[link|number]] {i}') for i in range(50)] + [('Template:T', '{{t}}')]
+        self.dump = make_dump(os.path.join(self.tmp_dir.name, 'dump.xml.bz2'), self.pages)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_read_page(self):
+        async def _read(reader):
+            return [page async for page in reader.read_page(self.dump, b_ignore_template=True)]
+
+        for b_parse_in_process in (False, True):
+            reader = AsyncWikiDumpReader(b_parse_in_process=b_parse_in_process, prefetch=2, batch_size=7)
+            self.assertEqual(self.pages[:-1], asyncio.run(_read(reader)))
+
+    def test_early_stop(self):
+        async def _read_first(reader):
+            async for page in reader.read_page(self.dump):
+                return page
+
+        reader = AsyncWikiDumpReader(prefetch=1, batch_size=1)
+        self.assertEqual(self.pages[0], asyncio.run(_read_first(reader)))
+
+    def test_cancel(self):
+        async def _cancel(reader):
+            loop = asyncio.get_running_loop()
+            loop.set_default_executor(ThreadPoolExecutor(max_workers=1))
+            started = asyncio.Event()
+
+            async def _read():
+                async for _ in reader.read_page(self.dump):
+                    started.set()
+
+            task = asyncio.create_task(_read())
+            await started.wait()
+            # Let the executor thread block on the stalled producer, then cancel the reading task
+            await asyncio.sleep(0.2)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+            # The single executor thread must have been released
+            return await asyncio.wait_for(loop.run_in_executor(None, int, '1'), 5)
+
+        reader = AsyncWikiDumpReader(StalledWikiDumpReader(), b_parse_in_process=True, batch_size=1)
+        self.assertEqual(1, asyncio.run(_cancel(reader)))
+
+    def test_clean(self):
+        async def _clean(reader):
+            text = await reader.clean("Some [[link|text]].")
+            pages = [page async for page in reader.clean_pages(self.dump, b_ignore_template=True)]
+            return text, pages
+
+        text, pages = asyncio.run(_clean(AsyncWikiDumpReader(prefetch=2, batch_size=4)))
+        self.assertEqual("Some text.", text)
+        self.assertEqual([(f'Page {i}', f'Text number {i}') for i in range(50)], pages)
+
+
+class TestArticleLookup(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.pages = [(f'Page {i}', f'Text [[link|number]] {i}') for i in range(10)]
+        self.dump, self.index = make_multistream_dump(os.path.join(self.tmp_dir.name, 'dump-multistream.xml.bz2'),
+                                                      os.path.join(self.tmp_dir.name, 'dump-index.txt.bz2'),
+                                                      self.pages)
+        self.lookup = ArticleLookup(self.dump, self.index)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_lru_cache(self):
+        cache = LRUCache(5)
+        cache.put('a', 'aa')
+        cache.put('b', 'bb')
+        cache.get('a')
+        cache.put('c', 'cc')
+        self.assertEqual(['a', 'c'], [key for key in ('a', 'b', 'c') if key in cache])
+        self.assertEqual(4, cache.size)
+        cache.put('d', 'dddddd')
+        self.assertNotIn('d', cache)
+
+    def test_lookup(self):
+        self.assertEqual('Text number 4', self.lookup.get('Page 4'))
+        self.assertEqual('Text [[link|number]] 4', self.lookup.get_raw('Page 4'))
+        # The other pages of the stream were decoded along
+        self.assertEqual(1, len(self.lookup.blocks))
+        self.assertEqual({'Page 3', 'Page 4', 'Page 5'}, set(self.lookup.blocks.get(self.lookup.index.offsets[1])))
+        self.assertIsNone(self.lookup.get('Page 42'))
+        self.assertEqual({'Page 0': 'Text number 0', 'Page 9': 'Text number 9', 'Nope': None},
+                         self.lookup.get_many(['Page 0', 'Page 9', 'Nope']))
+
+    def test_server(self):
+        server = make_server(self.lookup, ('127.0.0.1', 0))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            url = f'http://127.0.0.1:{server.server_address[1]}'
+            with urllib.request.urlopen(url + '/page?title=Page%202') as response:
+                self.assertEqual('Text number 2', response.read().decode('utf-8'))
+            request = urllib.request.Request(url + '/pages', data=json.dumps(['Page 1', 'Page 7']).encode('utf-8'))
+            with urllib.request.urlopen(request) as response:
+                self.assertEqual({'Page 1': 'Text number 1', 'Page 7': 'Text number 7'}, json.loads(response.read()))
+            with self.assertRaises(urllib.error.HTTPError):
+                urllib.request.urlopen(url + '/page?title=Nope')
+            for body in (b'not json', b'3', b'{"Page 1": 1}', b'"Page 1"', b'["Page 1", 2]'):
+                with self.assertRaises(urllib.error.HTTPError) as context:
+                    urllib.request.urlopen(urllib.request.Request(url + '/pages', data=body))
+                self.assertEqual(400, context.exception.code)
+                context.exception.close()
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def test_unix_socket_server(self):
+        path = os.path.join(self.tmp_dir.name, 'lookup.sock')
+        server = make_server(self.lookup, path)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.connect(path)
+                sock.sendall(b'GET /page?title=Page%208 HTTP/1.0\r\n\r\n')
+                response = b''
+                while True:
+                    chunk = sock.recv(4096)
+                    if not chunk:
+                        break
+                    response += chunk
+            self.assertTrue(response.startswith(b'HTTP/1.0 200'))
+            self.assertTrue(response.endswith(b'\r\n\r\nText number 8'))
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+class TestReadPageParallel(unittest.TestCase):
+    def test_read_page_parallel(self):
+        pages = [(f'Page {i}', f'Text {i} ' * i) for i in range(100)] + \
+                [('Template:T', 'Template'), ('Redirect', '#REDIRECT [[Page 1]]'), ('Café', 'Ünïcödé')]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            dump = make_dump(os.path.join(tmp_dir, 'dump.xml'), pages, b_bz2=False)
+            wr = WikiDumpReader(b_bz2=False)
+            for kwargs in ({}, {'b_ignore_template': True, 'b_ignore_redirs': True, 'min_chars': 20}):
+                self.assertEqual(list(wr.read_page(dump, **kwargs)),
+                                 list(wr.read_page_parallel(dump, nb_workers=3, range_size=1000, **kwargs)))
+            # Page 0 has no text
+            self.assertEqual(pages[1:], list(wr.read_page_parallel(dump, nb_workers=2)))
+
+            with self.assertRaises(ValueError):
+                next(WikiDumpReader().read_page_parallel(dump))
+
+
+class SlowWikiDumpReader(WikiDumpReader):
+    @classmethod
+    def clean(cls, text, title='N/A', **kwargs):
+        if title == 'Slow':
+            while True:
+                pass
+        return super().clean(text, title=title, **kwargs)
+
+
+class SlowerWikiDumpReader(SlowWikiDumpReader):
+    @classmethod
+    def clean_light(cls, text):
+        while True:
+            pass
+
+
+class TestQuarantine(unittest.TestCase):
+    def setUp(self):
+        self.pages = [('Fast', "Some [[link|text]]."), ('Slow', "Slow ''page'' [[with|link]].{{t}}"),
+                      ('Fast too', "More text.")]
+
+    def test_clean_light(self):
+        text = "Intro<!-- c --> [[a|b]] [[c]] {{t|x}}<ref name=x/><ref>r</ref> '''bold'''.\n" \
+               "[[Category:C]]\n== Header ==\n* item\n{|\n| cell\n|}\n== See also ==\nGone"
+        self.assertEqual("Intro b c  bold.\nHeader\nitem\n{|\n", WikiDumpReader.clean_light(text))
+
+        # Unclosed tags must not make the patterns quadratic
+        text = 'x <ref name=a>' * 20000 + '<!-- ' * 20000
+        start = time.monotonic()
+        self.assertEqual(text, WikiDumpReader.clean_light(text))
+        self.assertLess(time.monotonic() - start, 5.)
+
+    def test_time_budget(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file = os.path.join(tmp_dir, 'quarantine.jsonl')
+            for nb_workers in (1, 2):
+                with Quarantine(file) as quarantine:
+                    res = list(SlowWikiDumpReader.clean_pages(self.pages, nb_workers=nb_workers, batch_size=2,
+                                                              time_budget=0.2, quarantine=quarantine))
+                self.assertEqual([('Fast', 'Some text.'), ('Slow', 'Slow page link.'), ('Fast too', 'More text.')],
+                                 res)
+                self.assertEqual(1, quarantine.count)
+
+            with open(file, encoding='utf-8') as fin:
+                self.assertEqual([{'title': 'Slow', 'text': self.pages[1][1]}] * 2,
+                                 [json.loads(line) for line in fin])
+
+        quarantine = Quarantine(fallback='skip')
+        res = list(SlowWikiDumpReader.clean_pages(self.pages, time_budget=0.2, quarantine=quarantine))
+        self.assertEqual(['Fast', 'Fast too'], [title for title, text in res])
+        self.assertEqual(1, quarantine.count)
+
+        with self.assertRaises(ValueError):
+            list(SlowWikiDumpReader.clean_pages(self.pages, time_budget=0.2))
+
+        # Pages that exceed the budget in the fallback too are skipped
+        quarantine = Quarantine()
+        res = list(SlowerWikiDumpReader.clean_pages(self.pages, time_budget=0.2, quarantine=quarantine))
+        self.assertEqual(['Fast', 'Fast too'], [title for title, text in res])
+        self.assertEqual(1, quarantine.count)
+
+
+class TestReadPageParts(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.pages = [(f'Page {i}', f'Text {i}') for i in range(1, 121)]
+        self.pages[50] = ('Template:T', 'Template')
+        # Part 10 sorts after part 2
+        for part, (start, end) in zip((1, 2, 10), ((0, 40), (40, 90), (90, 120))):
+            make_dump(os.path.join(self.tmp_dir.name, f'pages-articles{part}.xml-p{start + 1}p{end}.bz2'),
+                      self.pages[start:end], first_id=start + 1)
+        self.pattern = os.path.join(self.tmp_dir.name, 'pages-articles*.xml-*.bz2')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_get_parts(self):
+        parts = WikiDumpReader.get_parts(self.pattern)
+        self.assertEqual(['pages-articles1.xml-p1p40.bz2', 'pages-articles2.xml-p41p90.bz2',
+                          'pages-articles10.xml-p91p120.bz2'], [os.path.basename(part) for part in parts])
+        self.assertEqual(parts, WikiDumpReader.get_parts(parts))
+        self.assertEqual([parts[0]], WikiDumpReader.get_parts(parts[0]))
+
+    def test_read_page(self):
+        wr = WikiDumpReader()
+        self.assertEqual(self.pages, list(wr.read_page(self.pattern)))
+        self.assertEqual(self.pages[40:90], list(wr.read_page(WikiDumpReader.get_parts(self.pattern)[1:2])))
+
+    def test_file_object(self):
+        wr = WikiDumpReader()
+        part = WikiDumpReader.get_parts(self.pattern)[0]
+        with open(part, 'rb') as fin:
+            self.assertEqual([fin], WikiDumpReader.get_parts(fin))
+            self.assertEqual(self.pages[:40], list(wr.read_page(fin)))
+        with open(part, 'rb') as fin:
+            self.assertEqual([title for title, text in self.pages[:40]],
+                             [page.title for page in wr.read_page_records(fin)])
+
+    def test_read_page_parts(self):
+        wr = WikiDumpReader()
+        expected = self.pages[:50] + self.pages[51:]
+        self.assertEqual(expected, list(wr.read_page_parts(self.pattern, batch_size=7, prefetch=2,
+                                                           b_ignore_template=True)))
+        pages = list(wr.read_page_parts(self.pattern, b_ordered=False, nb_workers=2, batch_size=7,
+                                        b_ignore_template=True))
+        self.assertEqual(sorted(expected), sorted(pages))
+
+        pages = wr.read_page_parts(self.pattern, batch_size=1, prefetch=1)
+        self.assertEqual(self.pages[0], next(pages))
+        pages.close()
+
+
+class TestPageRecords(unittest.TestCase):
+    def test_read_page_records(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            dump = make_dump(os.path.join(tmp_dir, 'dump.xml.bz2'), [
+                ('Howl', 'I saw the [[best minds]]'), ('Template:Poem', '{{poem}}'), ('Empty', ''),
+                ('Beat', '#REDIRECT [[Beat Generation]]')])
+            pages = list(WikiDumpReader().read_page_records(dump, b_ignore_template=True))
+            self.assertEqual(['Howl', 'Empty', 'Beat'], [page.title for page in pages])
+            self.assertEqual([1, 3, 4], [page.id for page in pages])
+            self.assertEqual([0, 0, 0], [page.ns for page in pages])
+            self.assertEqual('I saw the [[best minds]]', pages[0].raw_text)
+            self.assertEqual('I saw the best minds', pages[0].cleaned)
+            self.assertIs(pages[0].cleaned, pages[0].cleaned)
+            self.assertIsNone(pages[1].raw_text)
+            self.assertIsNone(pages[1].cleaned)
+            self.assertEqual("Page(title='Beat', id=4, ns=0)", repr(pages[2]))
+
+            pages = list(WikiDumpReader().read_page_records(dump, b_ignore_redirs=True, min_chars=1))
+            self.assertEqual(['Howl', 'Template:Poem'], [page.title for page in pages])
+            with self.assertRaises(AttributeError):
+                pages[0].extra = 1
+
+
+class TestCategories(unittest.TestCase):
+    def test_remove_categories(self):
+        categories = []
+        text = "Text.\n[[Category:Beat poets|Ginsberg, Allen]]\n[[category:American poets]]\n[[Category: Jews ]]"
+        self.assertEqual("Text.\n\n\n", WikiDumpReader.remove_categories(text, categories=categories))
+        self.assertEqual(['Beat poets', 'American poets', 'Jews'], categories)
+
+        categories = []
+        WikiDumpReader.clean(text, categories=categories)
+        self.assertEqual(['Beat poets', 'American poets', 'Jews'], categories)
+
+        categories = []
+        WikiDumpReader.remove_categories("[[category:b]][[Category:a]]", categories=categories)
+        self.assertEqual(['b', 'a'], categories)
+
+    def test_categories_after_references(self):
+        text = "Poem.\n== References ==\n<references/>\n<!-- [[Category:Hidden]] -->\n" \
+               "[[Category:Poems]]\n[[Category:Beat Generation]]"
+        categories = []
+        self.assertEqual('Poem.\n', WikiDumpReader.clean(text, categories=categories))
+        self.assertEqual(['Poems', 'Beat Generation'], categories)
+        self.assertEqual([('Howl', 'Poem.\n', ['Poems', 'Beat Generation'])],
+                         list(WikiDumpReader.clean_pages([('Howl', text)], b_categories=True)))
+
+    def test_clean_pages(self):
+        pages = [('Howl', "Poem.[[Category:Poems]]"), ('Kaddish', "Poem.[[Category:Poems|Kaddish]]")]
+        self.assertEqual([('Howl', 'Poem.', ['Poems']), ('Kaddish', 'Poem.', ['Poems'])],
+                         list(WikiDumpReader.clean_pages(pages, b_categories=True)))
+
+    def test_category_index(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            dump = make_dump(os.path.join(tmp_dir, 'dump.xml.bz2'), [
+                ('Howl', 'Poem.[[Category:Poems]][[Category:Beat Generation]]'),
+                ('Allen Ginsberg', 'Poet.[[Category:Beat_Generation|Ginsberg]][[category:poets]]'),
+                ('Kaddish', 'Poem.[[Category:Poems]][[Category:Poems]]'),
+                ('No categories', 'Text.')])
+
+            writer = CategoryIndexWriter()
+            for page in WikiDumpReader().read_page_records(dump):
+                writer.add(page.id, page.categories)
+            self.assertEqual(6, len(writer))
+
+            with writer.write(os.path.join(tmp_dir, 'categories.bin')) as index:
+                self.assertEqual(['Beat Generation', 'Poems', 'Poets'], list(index.categories()))
+                self.assertEqual([1, 3], index.get('Poems').tolist())
+                self.assertEqual([1, 2], index.get('Category:Beat Generation').tolist())
+                self.assertEqual([2], index.get('poets').tolist())
+                self.assertEqual([], index.get('Novels').tolist())
+                self.assertIn('Poems', index)
+                self.assertNotIn('Novels', index)
+
+            # Closing while page ids are still in use leaves them readable
+            index = CategoryIndex(os.path.join(tmp_dir, 'categories.bin'))
+            poems = index.get('Poems')
+            index.close()
+            self.assertTrue(index._fin.closed)
+            self.assertEqual([1, 3], poems.tolist())
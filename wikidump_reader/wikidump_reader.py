@@ -1,9 +1,106 @@
 # Check: https://www.heatonresearch.com/2017/03/03/python-basic-wikipedia-parsing.html
 # Check: from https://effbot.org/zone/element-iterparse.htm
 import bz2
+import collections
+import glob
+import heapq
+import itertools
+import math
+import mmap
+import multiprocessing
 import os
+import re
 import xml.etree.ElementTree as etree
 
+from wikidump_reader.batch import PageBatch
+from wikidump_reader.page import Page
+from wikidump_reader.quarantine import CleaningTimeout, time_limit
+from wikidump_reader.redirects import RedirectTable
+
+
+def _batches(iterable, batch_size):
+    """
+    Split an iterable into lists of batch_size elements.
+    """
+    iterator = iter(iterable)
+    batch = list(itertools.islice(iterator, batch_size))
+    while batch:
+        yield batch
+        batch = list(itertools.islice(iterator, batch_size))
+
+
+def _clean_batch(args):
+    """
+    Worker function for 'WikiDumpReader.clean_pages'.
+    """
+    cls, batch, stats, time_budget, fallback, b_categories = args
+    res, quarantined = [], []
+    for title, text in batch:
+        categories = [] if b_categories else None
+        try:
+            with time_limit(time_budget, title=title):
+                cleaned = cls.clean(text, title=title, categories=categories)
+        except CleaningTimeout:
+            quarantined.append((title, text))
+            if fallback == 'skip':
+                continue
+            try:
+                # The fallback gets the same budget; pages that exceed it again are skipped
+                with time_limit(time_budget, title=title):
+                    cleaned = cls.clean_light(text)
+            except CleaningTimeout:
+                continue
+            if b_categories:
+                categories = [category.strip() for category in cls.LIGHT_CATEGORY_PATTERN.findall(text)
+                              if category.strip()]
+        except ValueError as e:
+            print(e)
+            continue
+        if stats is not None:
+            stats.update(cleaned)
+        res.append((title, cleaned, categories) if b_categories else (title, cleaned))
+    return res, stats, quarantined
+
+
+def _read_parts(reader, parts_queue, out_queue, batch_size, kwargs):
+    """
+    Worker function for 'WikiDumpReader.read_page_parts': read the parts from parts_queue until it returns None, and
+    put their pages, per batch, in out_queue. The end of the output is marked with None, an error with the exception
+    object.
+    """
+    try:
+        part = parts_queue.get()
+        while part is not None:
+            for batch in reader._read_id_batches(part, batch_size, kwargs):
+                out_queue.put(batch)
+            part = parts_queue.get()
+        out_queue.put(None)
+    except Exception as e:
+        out_queue.put(e)
+
+
+def _drain(out_queue, nb_producers=1):
+    """
+    Yield the elements of the batches put in out_queue by nb_producers '_read_parts' workers.
+    """
+    while nb_producers > 0:
+        batch = out_queue.get()
+        if batch is None:
+            nb_producers -= 1
+        elif isinstance(batch, Exception):
+            raise batch
+        else:
+            yield from batch
+
+
+def _read_range(args):
+    """
+    Worker function for 'WikiDumpReader.read_page_parallel'.
+    """
+    reader, file, start, end, kwargs = args
+    with open(file, 'rb') as fin, mmap.mmap(fin.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        return list(reader.read_page_fragment(mm, start=start, end=end, **kwargs))
+
 
 class WikiDumpReader:
     PREFIX = "{http://www.mediawiki.org/xml/export-0.10/}"
@@ -11,6 +108,16 @@ class WikiDumpReader:
     HTML_ENTS = {'&nbsp;': ' ', '&lt;': '<', '&gt;': '>', '&amp;': '&', '&quot;': '"', '&apos;': "'",
                  '&cent;': '¢', '&pound;': '£', '&yen;': '¥', '&euro;': '€', '&copy;': '©', '&reg;': '®'}
     REMOVE_LINE_STARTS = {'*', '#', ':'}
+    # Patterns used by 'clean_light', in order; none of them handles nesting, but all of them run in linear time, also
+    # on unclosed tags: a match never extends past the next opening tag, or the next bracket/brace
+    LIGHT_PATTERNS = [(re.compile(r'<!--(?:(?!<!--|-->).)*-->', re.DOTALL), ''),
+                      (re.compile(r'<ref[^<>]*?/>'), ''),
+                      (re.compile(r'<ref[^<>]*>(?:(?!<ref[\s>/]|</ref>).)*</ref>', re.DOTALL), ''),
+                      (re.compile(r'\{\{[^{}]*\}\}'), ''),
+                      (re.compile(r'\[\[(?:Category|category|File|Image):[^\[\]]*\]\]'), ''),
+                      (re.compile(r'\[\[(?:[^\[\]|]*\|)?([^\[\]|]*)\]\]'), r'\1'),
+                      (re.compile(r"'{2,}"), '')]
+    LIGHT_CATEGORY_PATTERN = re.compile(r'\[\[[Cc]ategory:([^\[\]|]*)(?:\|[^\[\]]*)?\]\]')
 
     def __init__(self, b_bz2=True,
                  prefix=PREFIX):
@@ -64,11 +171,13 @@ class WikiDumpReader:
                   b_ignore_redirs=False,
                   b_ignore_template=False,
                   b_ignore_wikipedia=False,
-                  min_chars=0):
+                  min_chars=0,
+                  progress=None):
         """
         Convenience method that will return the text of an article
 
-        :param file:
+        :param file: path to the dump; for split dumps, a list of paths or a glob pattern of the parts, that will be
+        read one after the other (see 'read_page_parts' to read them in parallel)
         :param b_ignore_category: ignore category pages
         :param b_ignore_disamb: ignore pages that have '(disambiguation)' in their title; this does not catch all
         disambiguation pages
@@ -76,8 +185,316 @@ class WikiDumpReader:
         :param b_ignore_template: ignore template pages
         :param b_ignore_wikipedia: ignore 'Wikipedia:' pages
         :param min_chars: min number of characters a text should have; if less, article will be skipped
+        :param progress: Progress object to report throughput to
         :return:
         """
+        parts = self.get_parts(file)
+        if len(parts) != 1 or parts[0] is not file:
+            if progress is not None:
+                progress.expect(parts)
+            for part in parts:
+                yield from self.read_page(part, b_ignore_category=b_ignore_category, b_ignore_disamb=b_ignore_disamb,
+                                          b_ignore_redirs=b_ignore_redirs, b_ignore_template=b_ignore_template,
+                                          b_ignore_wikipedia=b_ignore_wikipedia, min_chars=min_chars,
+                                          progress=progress)
+            return
+
+        with self._open(file) as fin:
+            if progress is not None:
+                progress.start(file, fin)
+            context = etree.iterparse(fin, events=("start", "end"))
+            for page, page_title, page_text in self._read_pages(context, b_ignore_category=b_ignore_category,
+                                                                b_ignore_disamb=b_ignore_disamb,
+                                                                b_ignore_redirs=b_ignore_redirs,
+                                                                b_ignore_template=b_ignore_template,
+                                                                b_ignore_wikipedia=b_ignore_wikipedia,
+                                                                min_chars=min_chars,
+                                                                progress=progress):
+                yield page_title, page_text
+            if progress is not None:
+                progress.stop()
+
+    @staticmethod
+    def get_parts(file):
+        """
+        Get the parts of a split dump, e.g., 'enwiki-...-pages-articles1.xml-p1p41242.bz2',
+        'enwiki-...-pages-articles2.xml-p41243p151573.bz2', ...
+
+        :param file: a list of paths, a glob pattern, or a single dump (path or file object)
+        :return: list of paths; the parts matching a glob pattern are sorted by their part number. Anything else
+        than a list or a glob pattern is returned as the only part.
+        """
+        if isinstance(file, (list, tuple)):
+            return list(file)
+        if isinstance(file, str) and not os.path.exists(file) and glob.has_magic(file):
+            return sorted(glob.glob(file),
+                          key=lambda path: [int(t) if t.isdigit() else t for t in re.split(r'(\d+)', path)])
+        return [file]
+
+    def read_page_parts(self, file, b_ordered=True, nb_workers=None, batch_size=100, prefetch=64, **kwargs):
+        """
+        Read the parts of a split dump in parallel, and return their pages as a single stream.
+
+        Each part is read by its own worker process. If b_ordered, pages are merged by page id; as a part is only
+        read prefetch batches ahead of the consumer, parts with consecutive page id ranges are then mostly read one
+        after the other, unless the consumer is slower than a single worker. If not b_ordered, pages are returned
+        as soon as any worker has read them, and nb_workers processes share the parts.
+
+        :param file: list of paths or glob pattern of the parts, see 'get_parts'
+        :param b_ordered: return the pages ordered by page id
+        :param nb_workers: number of worker processes if not b_ordered; defaults to the number of parts
+        :param batch_size: number of pages sent by a worker at once
+        :param prefetch: max number of batches per worker that are read ahead
+        :param kwargs: filters, see 'read_page'
+        :return: generator of (title, text) tuples
+        """
+        parts = self.get_parts(file)
+        workers = []
+        try:
+            if b_ordered:
+                out_queues = []
+                for part in parts:
+                    parts_queue, out_queue = multiprocessing.Queue(), multiprocessing.Queue(maxsize=prefetch)
+                    parts_queue.put(part)
+                    parts_queue.put(None)
+                    out_queues.append(out_queue)
+                    workers.append(multiprocessing.Process(target=_read_parts, daemon=True,
+                                                           args=(self, parts_queue, out_queue, batch_size, kwargs)))
+                pages = heapq.merge(*(_drain(out_queue) for out_queue in out_queues), key=lambda page: page[0])
+            else:
+                nb_workers = min(nb_workers or len(parts), len(parts))
+                parts_queue, out_queue = multiprocessing.Queue(), multiprocessing.Queue(maxsize=prefetch * nb_workers)
+                for part in parts + [None] * nb_workers:
+                    parts_queue.put(part)
+                workers = [multiprocessing.Process(target=_read_parts, daemon=True,
+                                                   args=(self, parts_queue, out_queue, batch_size, kwargs))
+                           for _ in range(nb_workers)]
+                pages = _drain(out_queue, nb_producers=nb_workers)
+
+            for worker in workers:
+                worker.start()
+            for page_id, page_title, page_text in pages:
+                yield page_title, page_text
+        finally:
+            for worker in workers:
+                if worker.pid is None:
+                    continue
+                if worker.is_alive():
+                    worker.terminate()
+                worker.join()
+
+    def _read_id_batches(self, file, batch_size, kwargs):
+        """
+        Read a dump, and return its pages as lists of batch_size (page_id, title, text) tuples.
+        """
+        with self._open(file) as fin:
+            pages = ((self.get_page_id(page), page_title, page_text)
+                     for page, page_title, page_text in
+                     self._read_pages(etree.iterparse(fin, events=("start", "end")), **kwargs))
+            yield from _batches(pages, batch_size)
+
+    def read_page_batches(self, file, batch_size=1000, progress=None, **kwargs):
+        """
+        Same as 'read_page', but return the pages in columnar batches, i.e., PageBatch objects holding the page ids,
+        the titles and the utf-8 encoded texts of batch_size pages, concatenated in a single buffer.
+
+        :param file:
+        :param batch_size: number of pages per batch
+        :param progress: Progress object to report throughput to
+        :param kwargs: filters, see 'read_page'
+        :return: generator of PageBatch objects
+        """
+        with self._open(file) as fin:
+            if progress is not None:
+                progress.start(file, fin)
+            pages = ((self.get_page_id(page), page_title, page_text)
+                     for page, page_title, page_text in
+                     self._read_pages(etree.iterparse(fin, events=("start", "end")), progress=progress, **kwargs))
+            for batch in _batches(pages, batch_size):
+                yield PageBatch.from_pages(batch)
+            if progress is not None:
+                progress.stop()
+
+    def _read_pages(self, context,
+                    b_ignore_category=False,
+                    b_ignore_disamb=False,
+                    b_ignore_redirs=False,
+                    b_ignore_template=False,
+                    b_ignore_wikipedia=False,
+                    min_chars=0,
+                    progress=None,
+                    b_lazy_text=False):
+        """
+        Parse pages from a stream of ("start", "end") parser events; see 'read_page' for the meaning of the filters.
+
+        :param context: iterable of (event, element) tuples, e.g., as returned by etree.iterparse
+        :param b_lazy_text: don't look up the text of the pages, unless a text filter needs it; the returned text is
+        then None, and pages without text are not skipped
+        :return: generator of (page element, title, text) tuples; the page element is only valid until the next
+        page is requested, unless a reference to it is kept
+        """
+        b_text = not b_lazy_text or b_ignore_redirs or min_chars > 0
+        # turn it into an iterator
+        context = iter(context)
+
+        # get the root element
+        event, root = next(context)
+
+        for event, elem in context:
+            _tag = elem.tag[self.len_prefix:]
+            if event == 'end':
+                if _tag == 'page':
+                    page_title = self.get_page_title(elem)
+                    reason = self._skip_title(page_title, b_ignore_category=b_ignore_category,
+                                              b_ignore_disamb=b_ignore_disamb, b_ignore_template=b_ignore_template,
+                                              b_ignore_wikipedia=b_ignore_wikipedia)
+                    page_text = None
+                    if reason is None and b_text:
+                        try:
+                            page_text = self.get_page_text(elem)
+                            reason = self._skip_text(page_text, b_ignore_redirs=b_ignore_redirs, min_chars=min_chars)
+                        except ValueError as e:
+                            print(e)
+                            reason = 'error'
+                    if progress is not None:
+                        progress.page(reason)
+                    if reason is not None:
+                        continue
+
+                    yield elem, page_title, page_text
+                root.clear()
+
+    def read_page_records(self, file, progress=None, **kwargs):
+        """
+        Same as 'read_page', but return lightweight Page objects instead of (title, text) tuples. The title, id and
+        namespace of a Page are read right away; its raw text and cleaned text are only looked up, resp. computed,
+        when first accessed. Unless a text filter (b_ignore_redirs, min_chars) is used, pages without text are not
+        skipped; their raw_text is None.
+
+        :param file: see 'read_page'
+        :param progress: Progress object to report throughput to
+        :param kwargs: filters, see 'read_page'
+        :return: generator of Page objects
+        """
+        parts = self.get_parts(file)
+        if progress is not None:
+            progress.expect(parts)
+        for part in parts:
+            with self._open(part) as fin:
+                if progress is not None:
+                    progress.start(part, fin)
+                context = etree.iterparse(fin, events=("start", "end"))
+                for page, page_title, page_text in self._read_pages(context, progress=progress, b_lazy_text=True,
+                                                                    **kwargs):
+                    yield Page(page_title, self.get_page_id(page), self.get_page_ns(page), page=page,
+                               raw_text=page_text, cleaner=self.__class__)
+                if progress is not None:
+                    progress.stop()
+
+    def read_page_fragment(self, data, start=0, end=None, chunk_size=1 << 20, **kwargs):
+        """
+        Same as 'read_page', but for a fragment of a dump, i.e., a bytes-like object containing a sequence of
+        '<page>' elements, such as one decompressed stream of a multistream dump. Anything before the first and after
+        the last page (e.g., the '<siteinfo>' header or the closing '</mediawiki>' tag) is ignored.
+
+        The fragment is fed to the parser in chunks of memoryview slices, so it is never copied as a whole.
+
+        :param data: bytes, bytearray or mmap object
+        :param start: only consider data[start:end]
+        :param end: only consider data[start:end]
+        :param chunk_size: size of the chunks fed to the parser
+        :param kwargs: filters, see 'read_page'
+        :return: generator of (title, text) tuples
+        """
+        context = self._fragment_events(data, start=start, end=end, chunk_size=chunk_size)
+        for page, page_title, page_text in self._read_pages(context, **kwargs):
+            yield page_title, page_text
+
+    def read_page_parallel(self, file, nb_workers=None, range_size=1 << 26, **kwargs):
+        """
+        Same as 'read_page', but for uncompressed dumps only: the dump is memory-mapped, split into byte ranges that
+        are aligned to '<page>' tags, and the ranges are parsed in nb_workers worker processes. Pages are returned in
+        the same order as 'read_page' would.
+
+        Workers map the file themselves and feed the parser straight from the mapping, so the dump is never copied
+        between processes; only the parsed pages are.
+
+        :param file:
+        :param nb_workers: number of worker processes; defaults to the number of CPUs
+        :param range_size: approximate size, in bytes, of the ranges handed to the workers; as at most 2 * nb_workers
+        ranges are parsed ahead of the consumer, this bounds memory use
+        :param kwargs: filters, see 'read_page'
+        :return: generator of (title, text) tuples
+        """
+        if self.b_bz2:
+            raise ValueError("read_page_parallel only works on uncompressed dumps; use b_bz2=False.")
+        nb_workers = nb_workers or os.cpu_count() or 1
+        size = os.path.getsize(file)
+        if size == 0:
+            return
+
+        with open(file, 'rb') as fin, mmap.mmap(fin.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            nb_ranges = max(nb_workers, math.ceil(size / range_size))
+            bounds = []
+            for i in range(nb_ranges):
+                pos = mm.find(b'<page>', i * size // nb_ranges)
+                if pos < 0:
+                    break
+                if not bounds or pos > bounds[-1]:
+                    bounds.append(pos)
+        bounds.append(size)
+
+        # Keep at most 2 * nb_workers ranges in flight, so parsed ranges don't pile up if the consumer is slow
+        jobs = ((self, file, start, end, kwargs) for start, end in zip(bounds[:-1], bounds[1:]))
+        with multiprocessing.Pool(nb_workers) as pool:
+            for pages in self._imap_bounded(pool, _read_range, jobs, 2 * nb_workers):
+                yield from pages
+
+    def _fragment_events(self, data, start=0, end=None, chunk_size=1 << 20):
+        """
+        Generate ("start", "end") parser events for a fragment of a dump; see 'read_page_fragment'.
+        """
+        end = len(data) if end is None else end
+        start = data.find(b'<page>', start, end)
+        end = data.rfind(b'</page>', start, end)
+        parser = etree.XMLPullParser(events=("start", "end"))
+        parser.feed(f'<mediawiki xmlns="{self.prefix[1:-1]}">'.encode('utf-8'))
+        if 0 <= start < end:
+            end += len(b'</page>')
+            with memoryview(data) as view:
+                for pos in range(start, end, chunk_size):
+                    parser.feed(view[pos:min(pos + chunk_size, end)])
+                    yield from parser.read_events()
+        parser.feed(b'</mediawiki>')
+        yield from parser.read_events()
+        parser.close()
+
+    def read_history(self, file, b_latest_only=False,
+                     b_ignore_category=False,
+                     b_ignore_disamb=False,
+                     b_ignore_redirs=False,
+                     b_ignore_template=False,
+                     b_ignore_wikipedia=False,
+                     min_chars=0):
+        """
+        Read a pages-meta-history dump, i.e., a dump containing several revisions per page. 'read_page' only returns
+        the first (oldest) revision of such pages.
+
+        Every revision is dropped from the page as soon as it has been parsed, so at most one revision per page is
+        kept in memory, no matter how many revisions a page has.
+
+        :param file:
+        :param b_latest_only: only return the latest revision of each page; if False, all revisions are returned,
+        one at a time, in dump order
+        :param b_ignore_category: see 'read_page'
+        :param b_ignore_disamb: see 'read_page'
+        :param b_ignore_redirs: see 'read_page'; applied per revision
+        :param b_ignore_template: see 'read_page'
+        :param b_ignore_wikipedia: see 'read_page'
+        :param min_chars: see 'read_page'; applied per revision
+        :return: generator of (title, text) tuples if b_latest_only, else of (title, revision_id, timestamp, text)
+        tuples
+        """
         with self._open(file) as fin:
             # get an iterable
             context = etree.iterparse(fin, events=("start", "end"))
@@ -88,37 +505,54 @@ class WikiDumpReader:
             # get the root element
             event, root = next(context)
 
+            page, page_title, b_skip, latest = None, None, False, None
             for event, elem in context:
                 _tag = elem.tag[self.len_prefix:]
-                if event == 'end':
+                if event == 'start':
                     if _tag == 'page':
-                        page_title = self.get_page_title(elem)
-
-                        if b_ignore_category and page_title.startswith("Category:"):
-                            continue
-                        elif b_ignore_disamb and page_title.endswith("(disambiguation)"):
-                            continue
-                        elif b_ignore_template and page_title.startswith("Template:"):
-                            continue
-                        elif b_ignore_wikipedia and page_title.startswith("Wikipedia:"):
-                            continue
-                        try:
-                            page_text = self.get_page_text(elem)
-                            # This actually happens, sometimes...
-                            if page_text is None:
-                                continue
-                            if b_ignore_redirs and len(page_text) > 9 and page_text[:9].lower() == "#redirect":
-                                continue
-                            if len(page_text) < min_chars:
-                                continue
-
-                        except ValueError as e:
-                            print(e)
-                            continue
+                        page, page_title, b_skip, latest = elem, None, False, None
+                    continue
 
-                        yield page_title, page_text
+                if _tag == 'revision' and page is not None:
+                    # The title precedes the revisions
+                    if page_title is None:
+                        page_title = self.get_page_title(page)
+                        b_skip = self._skip_title(page_title, b_ignore_category=b_ignore_category,
+                                                  b_ignore_disamb=b_ignore_disamb,
+                                                  b_ignore_template=b_ignore_template,
+                                                  b_ignore_wikipedia=b_ignore_wikipedia)
+                    page.remove(elem)
+                    if b_skip:
+                        continue
+                    text = elem.find(self.prefix + 'text')
+                    text = None if text is None else text.text
+                    if b_latest_only:
+                        latest = text
+                    elif not self._skip_text(text, b_ignore_redirs=b_ignore_redirs, min_chars=min_chars):
+                        yield page_title, elem.findtext(self.prefix + 'id'), \
+                              elem.findtext(self.prefix + 'timestamp'), text
+                elif _tag == 'page':
+                    if b_latest_only and not b_skip and \
+                            not self._skip_text(latest, b_ignore_redirs=b_ignore_redirs, min_chars=min_chars):
+                        yield page_title, latest
+                    page, latest = None, None
+                    root.clear()
+                elif page is None:
                     root.clear()
 
+    def read_redirects(self, file):
+        """
+        Return a (title, target) tuple for every redirect page in the dump. The target is taken from the
+        '<redirect title=...>' element if present, else from the '#REDIRECT [[...]]' text.
+
+        :param file:
+        :return:
+        """
+        for page in self.read_tag(file, tag='page'):
+            target = self.get_page_redirect(page)
+            if target is not None:
+                yield self.get_page_title(page), target
+
     @classmethod
     def get_page_text(cls, page):
         return page.find(cls.PREFIX + 'revision').find(cls.PREFIX + 'text').text
@@ -128,13 +562,112 @@ class WikiDumpReader:
         return page.find(cls.PREFIX + 'title').text
 
     @classmethod
-    def process_links(cls, text: str, title="N/A"):
+    def get_page_id(cls, page):
+        return int(page.find(cls.PREFIX + 'id').text)
+
+    @classmethod
+    def get_page_ns(cls, page):
+        ns = page.find(cls.PREFIX + 'ns')
+        return None if ns is None else int(ns.text)
+
+    @staticmethod
+    def _skip_title(title, b_ignore_category=False, b_ignore_disamb=False, b_ignore_template=False,
+                    b_ignore_wikipedia=False):
+        """
+        Check whether a page should be skipped based on its title; see 'read_page' for the meaning of the flags.
+
+        :return: reason for skipping the page, or None if the page should be kept
+        """
+        if b_ignore_category and title.startswith("Category:"):
+            return 'category'
+        elif b_ignore_disamb and title.endswith("(disambiguation)"):
+            return 'disamb'
+        elif b_ignore_template and title.startswith("Template:"):
+            return 'template'
+        elif b_ignore_wikipedia and title.startswith("Wikipedia:"):
+            return 'wikipedia'
+        return None
+
+    @staticmethod
+    def _skip_text(text, b_ignore_redirs=False, min_chars=0):
+        """
+        Check whether a page should be skipped based on its text; see 'read_page' for the meaning of the flags.
+
+        :return: reason for skipping the page, or None if the page should be kept
+        """
+        # This actually happens, sometimes...
+        if text is None:
+            return 'no_text'
+        if b_ignore_redirs and len(text) > 9 and text[:9].lower() == "#redirect":
+            return 'redirect'
+        if len(text) < min_chars:
+            return 'min_chars'
+        return None
+
+    @classmethod
+    def get_page_redirect(cls, page):
+        """
+        Get the target of a redirect page, or None if the page is not a redirect.
+
+        :param page:
+        :return:
+        """
+        redirect = page.find(cls.PREFIX + 'redirect')
+        if redirect is not None and redirect.get('title'):
+            return redirect.get('title')
+        try:
+            return cls.parse_redirect(cls.get_page_text(page))
+        except AttributeError:
+            return None
+
+    @classmethod
+    def parse_redirect(cls, text):
+        """
+        Get the target of a '#REDIRECT [[target]]' text, or None if the text is not a redirect.
+
+        :param text:
+        :return:
+        """
+        if text is None or len(text) <= 9 or text[:9].lower() != "#redirect":
+            return None
+        start = text.find('[[', 9)
+        if start < 0:
+            return None
+        end = text.find(']]', start)
+        if end < 0:
+            return None
+        return cls._link_target(text[start+2:end]) or None
+
+    @staticmethod
+    def _link_target(link):
+        """
+        Get the target of the inside of a link, i.e., drop the '|label' and '#section' parts.
+
+        :param link: the text between '[[' and ']]'
+        :return:
+        """
+        pipe = link.find('|')
+        if pipe >= 0:
+            link = link[:pipe]
+        hash_pos = link.find('#')
+        if hash_pos >= 0:
+            link = link[:hash_pos]
+        return link.strip()
+
+    @classmethod
+    def process_links(cls, text: str, title="N/A", redirects=None, links=None):
         """
         Process links of type [[link|target]] to remove the square brackets and keep only the target value.
 
         :param text:
+        :param redirects: RedirectTable (or any object with a 'resolve' method) used to map link targets to their
+        canonical title; requires links
+        :param links: if not None, the target of every processed link, normalized with 'RedirectTable.normalize_title',
+        is appended to this list
         :return: processed text
         """
+        if redirects is not None and links is None:
+            raise ValueError("redirects only affect the link targets; pass a links list to collect them.")
         tag_open, tag_close, alt_close = "[[", "]]", "]"
         len_tag_open = len(tag_open)
         len_tag_close = len(tag_close)
@@ -191,6 +724,10 @@ class WikiDumpReader:
 
             # Check for '|'
             cnt = text.count('|', start, end)
+            if links is not None and cnt <= 1:
+                target = RedirectTable.normalize_title(cls._link_target(text[start+len_tag_open:end]))
+                if target:
+                    links.append(redirects.resolve(target) if redirects is not None else target)
             if cnt > 1:
                 # print(f"Don't know what to do with following text:\n\"{text[start:end+len_tag_close]}\"")
                 start = start + len_tag_open
@@ -208,15 +745,24 @@ class WikiDumpReader:
     # Remove stuff between tags
     # ############################################################
     @classmethod
-    def remove_categories(cls, text: str, title="N/A"):
+    def remove_categories(cls, text: str, title="N/A", categories=None):
         """
         Remove categories from Wiki code.
 
         :param text:
+        :param categories: if not None, the names of the removed categories (without 'Category:' and sort key) are
+        appended to this list, in page order
         :return: processed text
         """
-        text = cls.remove_tag(text, tag_open='[[Category:', tag_close=']]', title=title)
-        text = cls.remove_tag(text, tag_open='[[category:', tag_close=']]', title=title)
+        removed = None if categories is None else []
+        # Remove both spellings in a single pass, which keeps the names in page order
+        text = text.replace('[[category:', '[[Category:')
+        text = cls.remove_tag(text, tag_open='[[Category:', tag_close=']]', title=title, removed=removed)
+        if categories is not None:
+            for category in removed:
+                category = category.split('|', 1)[0].strip()
+                if category:
+                    categories.append(category)
         return text
 
     @classmethod
@@ -368,7 +914,7 @@ class WikiDumpReader:
 
     @classmethod
     def remove_tag(cls, text: str, tag_open: str, tag_close: str, alt_open: str = None, alt_close: str = '',
-                   b_crash=True, title='N/A'):
+                   b_crash=True, title='N/A', removed=None):
         """
         Remove parts from a text enclosed between the specified opening and closing tags.
 
@@ -383,6 +929,8 @@ class WikiDumpReader:
         useful for stuff like "<ref name=..." refs that can be closed either by "</ref>" or "/>".
         :param b_crash: crash if a tag seems to not be closed correctly
         :param title: the title of the Wikipedia page being processed; only used for error messaging
+        :param removed: if not None, the text between every removed pair of opening and closing tags is appended to
+        this list
         :return: processed text
         """
         if alt_open is None:
@@ -436,6 +984,9 @@ class WikiDumpReader:
                         print(msg)
                         end = start + len_tag_open
 
+            if removed is not None and end > start + len_tag_open:
+                removed.append(text[start + len_tag_open:end])
+
             # Update start position
             # prev_start = start
             start = text.find(tag_open, end)
@@ -454,16 +1005,17 @@ class WikiDumpReader:
     # "==References==
     # ############################################################
     @classmethod
-    def cut_bottom(cls, text):
+    def cut_bottom(cls, text, tail=None):
         """
         Remove everything from "==See Also==" or "==References==" or some other
 
         :param text:
+        :param tail: if not None, the removed part of the text, if any, is appended to this list
         :return:
         """
         prev_break = -1
         next_break = text.find('\n', prev_break+1)
-        res = ''
+        res = []
         b_stop = False
         while next_break >= 0:
             line = text[prev_break+1:next_break+1]
@@ -473,15 +1025,17 @@ class WikiDumpReader:
                         or heading == 'external links':
                     b_stop = True
                     break
-            res += line
+            res.append(line)
 
             prev_break = next_break
             next_break = text.find('\n', prev_break+1)
 
         if not b_stop:
-            res += text[prev_break+1:]
+            res.append(text[prev_break+1:])
+        elif tail is not None:
+            tail.append(text[prev_break+1:])
 
-        return res
+        return ''.join(res)
 
     @classmethod
     def remove_blank_lines(cls, text, max_sqns=2):
@@ -494,23 +1048,23 @@ class WikiDumpReader:
         """
         prev_break = 0
         next_break = text.find('\n', prev_break)
-        res = ''
+        res = []
 
         nb_breaks = 0
         while next_break >= 0:
             if not next_break - prev_break == 1:
-                res += text[prev_break:next_break]
+                res.append(text[prev_break:next_break])
                 nb_breaks = 1
             else:
                 nb_breaks += 1
                 if nb_breaks <= max_sqns:
-                    res += text[prev_break:next_break]
+                    res.append(text[prev_break:next_break])
 
             prev_break = next_break
             next_break = text.find('\n', prev_break+1)
-        res += text[prev_break:]
+        res.append(text[prev_break:])
 
-        return res
+        return ''.join(res)
 
     @classmethod
     def remove_headers(cls, text, b_delete=False):
@@ -524,12 +1078,12 @@ class WikiDumpReader:
         """
         prev_break = -1
         next_break = text.find('\n', prev_break+1)
-        res = ''
+        res = []
         while next_break >= 0:
             line = text[prev_break+1:next_break+1]
             if line.startswith('=') and line.endswith('=\n'):
                 line = '' if b_delete else cls._remove_header(line)
-            res += line
+            res.append(line)
 
             prev_break = next_break
             next_break = text.find('\n', prev_break+1)
@@ -539,9 +1093,9 @@ class WikiDumpReader:
         if line.startswith('=') and line.endswith('='):
             line = '' if b_delete else cls._remove_header(line)
 
-        res += line
+        res.append(line)
 
-        return res
+        return ''.join(res)
 
     @staticmethod
     def _remove_header(line):
@@ -630,7 +1184,7 @@ class WikiDumpReader:
         """
         prev_break = -1
         next_break = text.find('\n', prev_break+1)
-        res = ''
+        res = []
         while next_break >= 0:
             line = text[prev_break+1:next_break+1]
             b_ok = True
@@ -643,15 +1197,15 @@ class WikiDumpReader:
                     break
 
             if b_ok:
-                res += line
+                res.append(line)
 
             prev_break = next_break
             next_break = text.find('\n', prev_break+1)
 
         # We will assume the last line does not start with '|'...
-        res += text[prev_break+1:]
+        res.append(text[prev_break+1:])
 
-        return res
+        return ''.join(res)
 
     @classmethod
     def remove_lists_and_indents(cls, text, b_delete=False):
@@ -665,19 +1219,19 @@ class WikiDumpReader:
         """
         prev_break = -1
         next_break = text.find('\n', prev_break+1)
-        res = ''
+        res = []
         while next_break >= 0:
             line = text[prev_break+1:next_break+1]
             while line and line[0] in cls.REMOVE_LINE_STARTS:
                 line = '' if b_delete else line[1:].lstrip()
 
-            res += line
+            res.append(line)
 
             prev_break = next_break
             next_break = text.find('\n', prev_break+1)
-        res += text[prev_break+1:]
+        res.append(text[prev_break+1:])
 
-        return res
+        return ''.join(res)
 
     @classmethod
     def remove_paragraphs(cls, text):
@@ -689,32 +1243,37 @@ class WikiDumpReader:
         """
         prev_break = -1
         next_break = text.find('\n', prev_break+1)
-        res = ''
+        res = []
         while next_break >= 0:
             line = text[prev_break+1:next_break+1]
             if not line[0] == ';':
-                res += line
+                res.append(line)
 
             prev_break = next_break
             next_break = text.find('\n', prev_break+1)
-        res += text[prev_break+1:]
+        res.append(text[prev_break+1:])
 
-        return res
+        return ''.join(res)
 
     # ############################################################
     # Combine methods
     # ############################################################
     @classmethod
-    def clean(cls, text, title='N/A', b_debug=False):
+    def clean(cls, text, title='N/A', b_debug=False, redirects=None, links=None, categories=None):
         """
 
         :param text:
         :param title: Title of the Wikipedia article the text belongs to; only used for debugging/error reporting
+        :param redirects: see 'process_links'
+        :param links: see 'process_links'
+        :param categories: see 'remove_categories'
         :return: cleaned text
         """
         if b_debug:
             print("Cutting off bottom...")
-        text = cls.cut_bottom(text)
+        # Category links mostly come after the sections that are cut off; keep them for 'remove_categories'
+        tail = None if categories is None else []
+        text = cls.cut_bottom(text, tail=tail)
         if b_debug:
             print("Removing comments...")
         text = cls.remove_comments(text, title=title)
@@ -754,7 +1313,9 @@ class WikiDumpReader:
         text = cls.remove_table_lines(text)
         if b_debug:
             print("Removing categories...")
-        text = cls.remove_categories(text, title=title)
+        text = cls.remove_categories(text, title=title, categories=categories)
+        if tail:
+            cls.remove_categories(cls.remove_comments(tail[0], title=title), title=title, categories=categories)
         if b_debug:
             print("Removing files...")
         # Removing files should be done BEFORE processing links! Otherwise, the opening tags get confused.
@@ -765,7 +1326,7 @@ class WikiDumpReader:
         text = cls.remove_images(text, title=title)
         if b_debug:
             print("Processing links...")
-        text = cls.process_links(text, title=title)
+        text = cls.process_links(text, title=title, redirects=redirects, links=links)
         if b_debug:
             print("Removing double squares...")
         text = cls.remove_dbl_sqbrackets(text, title=title)
@@ -788,6 +1349,88 @@ class WikiDumpReader:
 
         return text
 
+    @classmethod
+    def clean_light(cls, text):
+        """
+        Cheap, less thorough, alternative to 'clean', used for pages that take 'clean' too long; see 'clean_pages'.
+        Only uses regular expressions and line based methods, so it runs in linear time, but it leaves nested
+        templates and links partly in place.
+
+        :param text:
+        :return: cleaned text
+        """
+        text = cls.cut_bottom(text)
+        for pattern, repl in cls.LIGHT_PATTERNS:
+            text = pattern.sub(repl, text)
+        text = cls.remove_table_lines(text)
+        text = cls.remove_headers(text)
+        text = cls.remove_lists_and_indents(text)
+        return cls.remove_blank_lines(text, max_sqns=1)
+
+    @classmethod
+    def clean_pages(cls, pages, nb_workers=1, batch_size=100, stats=None, progress=None, time_budget=None,
+                    quarantine=None, b_categories=False):
+        """
+        Clean a stream of pages, e.g., as returned by 'read_page', in nb_workers worker processes. Pages that can't
+        be cleaned are skipped.
+
+        :param pages: iterable of (title, text) tuples
+        :param nb_workers: number of worker processes; if 1, pages are cleaned in the current process. Pages are read
+        from the input in the calling thread, at most 2 * nb_workers batches ahead of the consumer
+        :param batch_size: number of pages sent to a worker at once
+        :param stats: CorpusStats object; if not None, statistics of the cleaned pages are computed per batch by the
+        workers and merged into it
+        :param progress: Progress object to report the number of cleaned pages to; pass the same object to
+        'read_page' to get both reading and cleaning telemetry
+        :param time_budget: max number of seconds cleaning a single page may take; pages that take longer are
+        quarantined. Pathological pages are interrupted when cleaning runs in the main thread of a process (always
+        the case for worker processes), on Unix; elsewhere the budget is only checked afterwards.
+        :param quarantine: Quarantine object that quarantined pages are written to, and that decides whether they
+        are returned cleaned with 'clean_light' or skipped; 'clean_light' gets the same time budget, pages that exceed
+        it again are skipped. Required if time_budget is set; its 'count' holds the number of quarantined pages
+        :param b_categories: also return the names of the categories of each page, see 'remove_categories'
+        :return: generator of (title, cleaned text) tuples, or (title, cleaned text, categories) tuples if
+        b_categories, in the same order as pages
+        """
+        if time_budget is not None and quarantine is None:
+            raise ValueError("A time_budget requires a quarantine, e.g., Quarantine() to only count pages.")
+        fallback = None if quarantine is None else quarantine.fallback
+        jobs = ((cls, batch, None if stats is None else stats.empty_like(), time_budget, fallback, b_categories)
+                for batch in _batches(pages, batch_size))
+
+        if nb_workers > 1:
+            with multiprocessing.Pool(nb_workers) as pool:
+                yield from cls._collect_cleaned(cls._imap_bounded(pool, _clean_batch, jobs, 2 * nb_workers), stats,
+                                                progress, quarantine)
+        else:
+            yield from cls._collect_cleaned(map(_clean_batch, jobs), stats, progress, quarantine)
+
+    @staticmethod
+    def _imap_bounded(pool, func, jobs, max_pending):
+        """
+        Same as 'pool.imap', but jobs are only taken from the (lazy) jobs iterable, in the calling thread, as long as
+        fewer than max_pending results are waiting; this keeps a slow consumer from having the whole input read and
+        processed ahead of it.
+        """
+        pending = collections.deque()
+        for job in jobs:
+            pending.append(pool.apply_async(func, (job,)))
+            if len(pending) >= max_pending:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+
+    @staticmethod
+    def _collect_cleaned(results, stats, progress, quarantine):
+        for res, batch_stats, quarantined in results:
+            if stats is not None:
+                stats.merge(batch_stats)
+            if progress is not None:
+                progress.cleaned(len(res))
+            for title, text in quarantined:
+                quarantine.add(title, text)
+            yield from res
+
     # todo: method to replace links by their text
     # todo: method to replace headers by their text
 